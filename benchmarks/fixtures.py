@@ -0,0 +1,278 @@
+'''
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program. If not, see <http://www.gnu.org/licenses/>.
+'''
+
+''' Builds pages in the same format as the BBC live scores site so that the
+    scraping code can be measured without a network connection.
+
+    Running this script (re)writes the saved pages in benchmarks/fixtures.
+'''
+import os
+import random
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                           "fixtures")
+
+TEAMS = [u"Arsenal", u"Aston Villa", u"Bournemouth",
+         u"Brighton &amp; Hove Albion", u"Burnley", u"Chelsea",
+         u"Crystal Palace", u"Everton", u"Hull", u"Leicester", u"Liverpool",
+         u"Man City", u"Man Utd", u"Middlesbrough", u"Southampton",
+         u"Stoke", u"Sunderland", u"Swansea", u"Tottenham", u"Watford",
+         u"West Brom", u"West Ham", u"Atl\xe9tico Madrid", u"M\xe1laga"]
+
+COMPETITIONS = [("118996114", u"Premier League"),
+                ("118996115", u"Championship"),
+                ("118996116", u"League One"),
+                ("118996117", u"League Two"),
+                ("118996118", u"Scottish Premiership"),
+                ("118996307", u"Spanish La Liga")]
+
+STATES = ["fixture", "live", "halftime", "report"]
+
+# Stand in for the navigation, scripts etc that make up most of a real page
+CHROME = u"".join(u'<li class="nav-item"><a href="/sport/{0}">Section {0}'
+                  u'</a></li><script type="text/javascript">'
+                  u'/* <![CDATA[ */ var x{0} = {{"a": {0}}}; /* ]]> */'
+                  u'</script>\n'.format(i) for i in range(400))
+
+
+def teamName(i):
+    '''Returns a unique team name for match number i.'''
+    name = TEAMS[i % len(TEAMS)]
+    if i >= len(TEAMS):
+        name = u"%s %d" % (name, i // len(TEAMS))
+    return name
+
+
+def makeMatch(i, state=None, homescore=0, awayscore=0, minute=None):
+    '''Returns a dict describing one match.'''
+    state = state or STATES[i % len(STATES)]
+    return {"id": "EFBO%06d" % (800000 + i),
+            "hometeam": teamName(2 * i),
+            "awayteam": teamName(2 * i + 1),
+            "state": state,
+            "homescore": homescore,
+            "awayscore": awayscore,
+            "minute": minute if minute is not None else (i * 7) % 90 + 1,
+            "kickoff": "%02d:%02d" % (12 + i % 8, (i % 4) * 15)}
+
+
+def matchRow(match):
+    '''Returns the html for a match-row.'''
+    state = match["state"]
+
+    if state == "fixture":
+        rowclass = "fixture"
+        elapsed = match["kickoff"]
+        score = u"V"
+    elif state == "report":
+        rowclass = "report"
+        elapsed = u"Full time"
+        score = u"%d - %d" % (match["homescore"], match["awayscore"])
+    elif state == "halftime":
+        rowclass = "live"
+        elapsed = u"Half Time"
+        score = u"%d - %d" % (match["homescore"], match["awayscore"])
+    else:
+        rowclass = "live"
+        elapsed = u"%d mins" % (match["minute"])
+        score = u"%d - %d" % (match["homescore"], match["awayscore"])
+
+    return (u'<tr id="match-row-{id}" class="{rowclass}">\n'
+            u'  <td class="statistics"><a href="#">Stats</a></td>\n'
+            u'  <td class="match-details">\n'
+            u'    <p>\n'
+            u'      <span class="team-home teams">\n'
+            u'        <span class="team-home"><a href="/sport/football/'
+            u'teams/x">{hometeam}</a></span>\n'
+            u'      </span>\n'
+            u'      <span class="score"> <abbr title="Score">{score}</abbr>'
+            u' </span>\n'
+            u'      <span class="team-away"><a href="/sport/football/'
+            u'teams/y">{awayteam}</a></span>\n'
+            u'    </p>\n'
+            u'  </td>\n'
+            u'  <td class="status"><span class="elapsed-time">{elapsed}'
+            u'</span></td>\n'
+            u'  <td class="match-link"><a class="report" href="/sport/'
+            u'football/{num}">Report</a></td>\n'
+            u'</tr>\n').format(id=match["id"],
+                               rowclass=rowclass,
+                               hometeam=match["hometeam"],
+                               awayteam=match["awayteam"],
+                               score=score,
+                               elapsed=elapsed,
+                               num=match["id"][4:])
+
+
+def liveScoresPage(matches, competition="", competitions=None):
+    '''Returns the html of a live scores page.
+
+    matches:        list of match dicts (see makeMatch)
+    competition:    id of the selected competition ("" for all)
+    competitions:   list of (id, name, number of matches) tuples for the
+                    drop down filter
+    '''
+    if competitions is None:
+        competitions = [(c, n, len(matches)) for c, n in COMPETITIONS]
+
+    options = [u'<option value="">All competitions</option>']
+    for cid, name, n in competitions:
+        selected = u' selected="selected"' if cid == competition else u""
+        options.append(u'<option value="competition-{0}"{1}>{2} ({3})'
+                       u'</option>'.format(cid, selected, name, n))
+
+    return (u'<!DOCTYPE html>\n<html><head><title>Live scores</title></head>'
+            u'<body>\n<ul class="navigation">{chrome}</ul>\n'
+            u'<div class="drop-down-filter live-scores-fixtures">'
+            u'<form><select name="competition">{options}</select></form>'
+            u'</div>\n'
+            u'<div id="matches-wrapper">\n<table class="table-stats">'
+            u'<tbody>\n{rows}</tbody></table>\n</div>\n'
+            u'<div id="footer">{chrome}</div></body></html>'
+            ).format(chrome=CHROME,
+                     options=u"".join(options),
+                     rows=u"".join(matchRow(m) for m in matches))
+
+
+def incidentsPage(incidents):
+    '''Returns the html of a match's incidents partial.
+
+    incidents:  list of (team, type, player, time) tuples where team is
+                "home" or "away" and type is "goal", "yellow" or "red"
+    '''
+    classes = {"goal": u"goal", "yellow": u"yellow-card", "red": u"red-card"}
+
+    rows = []
+    for team, incidenttype, player, t in incidents:
+        home, away = (player, u"") if team == "home" else (u"", player)
+        rows.append(u'<tr><td class="incident-player-home">{0}</td>'
+                    u'<td class="incident-type {1}"><span>{1}</span></td>'
+                    u'<td class="incident-time">{2}</td>'
+                    u'<td class="incident-player-away">{3}</td></tr>\n'
+                    .format(home, classes[incidenttype], t, away))
+
+    return (u'<div class="live-match-incidents">\n'
+            u'<table class="incidents-table"><tbody>\n{0}</tbody></table>\n'
+            u'</div>').format(u"".join(rows))
+
+
+def tableRow(position, team, seed=0):
+    '''Returns the html for one row of a league table.'''
+    rand = random.Random(seed + position)
+    won, drawn, lost = rand.randint(0, 15), rand.randint(0, 10), \
+                       rand.randint(0, 15)
+    goalsfor, goalsagainst = rand.randint(10, 60), rand.randint(10, 60)
+
+    games = u"".join(u'<li class="{0}" data-result="{1}-{2}" '
+                     u'data-against="{3}" data-date="2014-0{4}-1{4}" '
+                     u'title="{3} {1}-{2}">{0}</li>'
+                     .format(rand.choice(["win", "draw", "loss"]),
+                             rand.randint(0, 4), rand.randint(0, 4),
+                             teamName(rand.randint(0, 99)), i)
+                     for i in range(1, 10))
+
+    return (u'<tr id="team-{pos}" class="team">'
+            u'<td class="position"><span class="position-number">{pos}'
+            u'</span></td><td class="team-name">{team}</td>'
+            u'<td class="played">{played}</td><td class="won">{won}</td>'
+            u'<td class="drawn">{drawn}</td><td class="lost">{lost}</td>'
+            u'<td class="for">{gf}</td><td class="against">{ga}</td>'
+            u'<td class="goal-difference">{gd}</td>'
+            u'<td class="points">{pts}</td>'
+            u'<td class="last-10-games"><ol>{games}</ol></td></tr>\n'
+            ).format(pos=position, team=team, 
+                     played=won + drawn + lost, won=won, drawn=drawn,
+                     lost=lost, gf=goalsfor, ga=goalsagainst,
+                     gd=goalsfor - goalsagainst, pts=3 * won + drawn,
+                     games=games)
+
+
+def tablesPage(competition="", teams=20, competitions=None):
+    '''Returns the html of the league tables page.
+
+    competition:    id of the competition to show a table for ("" for the
+                    page without a table)
+    teams:          number of teams in the table
+    competitions:   list of (id, name) tuples for the drop down filter
+    '''
+    competitions = competitions or COMPETITIONS
+    names = dict(competitions)
+
+    options = [u'<option value="">Choose a competition</option>']
+    options += [u'<option value="competition-{0}">{1}</option>'.format(c, n)
+                for c, n in competitions]
+
+    table = u""
+    if competition:
+        table = (u'<div class="league-table full-table-wide">'
+                 u'<h2 class="table-header">{0} <div class="info">Key</div>'
+                 u'<script>var t = 1;</script></h2>\n<table><tbody>\n'
+                 u'{1}</tbody></table></div>\n'
+                 ).format(names.get(competition, u"League"),
+                          u"".join(tableRow(i + 1, teamName(i))
+                                   for i in range(teams)))
+
+    return (u'<!DOCTYPE html>\n<html><head><title>Tables</title></head>'
+            u'<body>\n<ul class="navigation">{chrome}</ul>\n'
+            u'<div class="drop-down-filter" id="filter-fixtures-no-js">'
+            u'<form><select name="filter">{options}</select></form></div>\n'
+            u'{table}<div id="footer">{chrome}</div></body></html>'
+            ).format(chrome=CHROME, options=u"".join(options), table=table)
+
+
+def matchPage(match):
+    '''Returns the html of a match report page (with the team badges).'''
+    return (u'<!DOCTYPE html>\n<html><body>\n<ul class="navigation">'
+            u'{chrome}</ul>\n'
+            u'<div class="team-badge"><img src="/badges/{home}.png" /></div>'
+            u'<div class="team-badge"><img src="/badges/{away}.png" /></div>'
+            u'\n</body></html>').format(chrome=CHROME,
+                                         home=match["id"] + "h",
+                                         away=match["id"] + "a")
+
+
+def makeMatches(n, seed=0):
+    '''Returns a list of n matches with random scores.'''
+    rand = random.Random(seed)
+    return [makeMatch(i, 
+                      homescore=rand.randint(0, 4), 
+                      awayscore=rand.randint(0, 4)) for i in range(n)]
+
+
+def savedPages():
+    '''Returns a list of (name, html) for the pages in the fixtures folder.'''
+    pages = []
+    for name in sorted(os.listdir(FIXTURE_DIR)):
+        if name.endswith(".html"):
+            with open(os.path.join(FIXTURE_DIR, name)) as f:
+                pages.append((name, f.read().decode("utf-8")))
+    return pages
+
+
+def writePages(sizes=(5, 20, 100)):
+    '''Writes a live scores page for each number of matches in sizes.'''
+    if not os.path.isdir(FIXTURE_DIR):
+        os.makedirs(FIXTURE_DIR)
+
+    for n in sizes:
+        path = os.path.join(FIXTURE_DIR, "livescores-%03d.html" % (n))
+        with open(path, "w") as f:
+            f.write(liveScoresPage(makeMatches(n), 
+                                   competition=COMPETITIONS[0][0])
+                    .encode("utf-8"))
+
+
+if __name__ == "__main__":
+    writePages()
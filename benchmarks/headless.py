@@ -0,0 +1,219 @@
+'''
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program. If not, see <http://www.gnu.org/licenses/>.
+'''
+
+''' Runs the addon outside Kodi using the stand in xbmc, xbmcgui,
+    xbmcaddon and pyxbmct modules in benchmarks/kodi.
+
+    ServiceRun runs the real service loop in default.py against a replayed
+    match day. Time is virtual, so each 5 second xbmc.sleep moves the match
+    day on straight away. The CPU time, wall time, requests and
+    notifications of each cycle of the loop are recorded.
+
+    Run from the addon folder:
+      python -m benchmarks.headless [--duration S] [--leagues N]
+                                    [--matches N] [--latency S]
+                                    [--errorrate F] [--cycles]
+
+    --cycles lists every cycle which made a request as well as the totals.
+    The addon's own timings (see footballscores.Timings) are shown at the
+    end.
+'''
+import json
+import os
+import runpy
+import sys
+import time
+from collections import namedtuple
+
+KODI = os.path.join(os.path.dirname(os.path.abspath(__file__)), "kodi")
+ADDON = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def install():
+    '''Makes the stand in modules importable as xbmc, xbmcgui etc.
+
+    Returns the (xbmc, xbmcgui, xbmcaddon) modules.
+    '''
+    if KODI not in sys.path:
+        sys.path.insert(0, KODI)
+
+    import xbmc
+    import xbmcgui
+    import xbmcaddon
+
+    return xbmc, xbmcgui, xbmcaddon
+
+
+xbmc, xbmcgui, xbmcaddon = install()
+
+from resources.lib import footballscores
+from benchmarks.fixtures import COMPETITIONS
+from benchmarks.replay import ReplayServer, matchDay
+
+
+class Cycle(namedtuple("Cycle", ["start", "cpu", "wall", "requests",
+                                 "notifications"])):
+    '''Measurements for one pass of the service loop.
+
+    start   - virtual time at the start of the cycle
+    cpu     - process CPU time in seconds (includes the replay server)
+    wall    - real time in seconds
+    '''
+
+    __slots__ = ()
+
+
+class ServiceRun(object):
+    '''Runs default.py against server for duration seconds of virtual time.
+
+    server      - a started and redirected ReplayServer
+    leagues     - list of league ids to watch
+    '''
+
+    def __init__(self, server, leagues, duration=8400):
+        self.server = server
+        self.leagues = leagues
+        self.duration = duration
+        self.cycles = []
+        self.__mark = None
+
+    def __measure(self):
+        return (time.clock(), time.time(),
+                self.server.stats()["requests"],
+                len(xbmcgui.notifications))
+
+    def __tick(self, now):
+        '''Called after every xbmc.sleep.'''
+        cpu, wall, requests, notifications = self.__measure()
+        start, (cpu0, wall0, requests0, notifications0) = self.__mark
+
+        self.cycles.append(Cycle(start, cpu - cpu0, wall - wall0,
+                                 requests - requests0,
+                                 notifications - notifications0))
+
+        # Move the match day on to the new time
+        self.server.seek(now)
+
+        if now >= self.duration:
+            xbmc.abortRequested = True
+
+        self.__mark = (now, self.__measure())
+
+    def run(self):
+        '''Runs the service loop until duration. Returns the cycles.'''
+        xbmc.reset()
+        xbmcgui.reset()
+
+        settings = xbmcaddon.Addon().settings
+        settings.clear()
+        settings["watchedleagues"] = json.dumps([int(l) for l in self.leagues])
+        settings["Alerts"] = "false"
+
+        footballscores.pagecache.invalidate()
+        footballscores.session.close()
+        footballscores.timings.resetStats()
+
+        # Everything that uses the addon's clock should see virtual time
+        clock = footballscores.UKClock.__dict__["clock"]
+        footballscores.UKClock.clock = staticmethod(xbmc.clock)
+
+        self.server.seek(0)
+        self.server.resetStats()
+        self.cycles = []
+        self.__mark = (0, self.__measure())
+        xbmc.sleephooks.append(self.__tick)
+
+        argv = sys.argv
+        try:
+            sys.argv = [os.path.join(ADDON, "default.py")]
+            runpy.run_path(sys.argv[0], run_name="__main__")
+        finally:
+            sys.argv = argv
+            footballscores.UKClock.clock = clock
+            xbmc.sleephooks.remove(self.__tick)
+
+        return self.cycles
+
+
+def report(cycles, listcycles=False):
+
+    busy = [c for c in cycles if c.requests]
+
+    if listcycles:
+        print "%8s %10s %10s %9s %9s" % ("time (s)", "cpu (ms)", "wall (ms)",
+                                         "requests", "alerts")
+        for c in busy:
+            print "%8d %10.1f %10.1f %9d %9d" % (c.start, c.cpu * 1000,
+                                                 c.wall * 1000, c.requests,
+                                                 c.notifications)
+        print
+
+    print "%d cycles, %d made requests" % (len(cycles), len(busy))
+    print "%d requests, %d notifications" % (
+                                sum(c.requests for c in cycles),
+                                sum(c.notifications for c in cycles))
+
+    for name, values in (("cpu", [c.cpu for c in busy]),
+                         ("wall", [c.wall for c in busy])):
+        if values:
+            values = sorted(values)
+            print "%-5s per busy cycle (ms): mean %.1f, median %.1f, max %.1f" % (
+                name,
+                sum(values) * 1000 / len(values),
+                values[len(values) // 2] * 1000,
+                values[-1] * 1000)
+
+    idle = [c.cpu for c in cycles if not c.requests]
+    if idle:
+        print "cpu per idle cycle (ms): mean %.2f" % (sum(idle) * 1000 /
+                                                       len(idle))
+
+
+def main(args):
+
+    options = {"--duration": 8400, "--leagues": 3, "--matches": 10,
+               "--latency": 0.0, "--errorrate": 0.0}
+    listcycles = False
+
+    while args:
+        arg = args.pop(0)
+        if arg == "--cycles":
+            listcycles = True
+        elif arg in options:
+            options[arg] = type(options[arg])(args.pop(0))
+        else:
+            print __doc__
+            return 2
+
+    corpus = matchDay(leagues=options["--leagues"],
+                      matches=options["--matches"],
+                      duration=options["--duration"])
+
+    leagues = [c for c, _ in COMPETITIONS[:options["--leagues"]]]
+
+    with ReplayServer(corpus, latency=options["--latency"],
+                      errorrate=options["--errorrate"]) as server:
+        cycles = ServiceRun(server, leagues, options["--duration"]).run()
+
+    report(cycles, listcycles)
+
+    print
+    print "\n".join(footballscores.timings.summary())
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
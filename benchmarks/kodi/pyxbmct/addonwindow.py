@@ -0,0 +1,136 @@
+'''
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program. If not, see <http://www.gnu.org/licenses/>.
+'''
+
+''' Stand in for the parts of PyXBMCt used by the addon.
+
+    Windows don't display anything. When doModal is called, each function in
+    modalhooks is called with the window so a script can "press" controls
+    (see AddonDialogWindow.press). If no hook closes the window it is closed
+    straight away.
+'''
+from xbmcgui import ListItem
+
+__all__ = ["ALIGN_LEFT", "ALIGN_RIGHT", "ALIGN_CENTER_X", "ALIGN_CENTER_Y",
+           "ALIGN_CENTER", "ACTION_PREVIOUS_MENU", "ACTION_NAV_BACK",
+           "AddonDialogWindow", "Button", "Image", "Label", "List"]
+
+ALIGN_LEFT = 0
+ALIGN_RIGHT = 1
+ALIGN_CENTER_X = 2
+ALIGN_CENTER_Y = 4
+ALIGN_CENTER = 6
+
+ACTION_PREVIOUS_MENU = 10
+ACTION_NAV_BACK = 92
+
+# Functions called with each window when it's shown
+modalhooks = []
+
+# Titles of every window shown
+shown = []
+
+
+class Control(object):
+
+    def __init__(self, label=u"", *args, **kwargs):
+        self.label = label
+
+    def getLabel(self):
+        return self.label
+
+    def controlUp(self, control):
+        pass
+
+    def controlDown(self, control):
+        pass
+
+    def controlLeft(self, control):
+        pass
+
+    def controlRight(self, control):
+        pass
+
+
+class Label(Control):
+    pass
+
+
+class Button(Control):
+    pass
+
+
+class Image(Control):
+    pass
+
+
+class List(Control):
+
+    def __init__(self, *args, **kwargs):
+        Control.__init__(self)
+        self.items = []
+        self.selected = 0
+
+    def addItems(self, items):
+        self.items += [ListItem(i) for i in items]
+
+    def getSelectedPosition(self):
+        return self.selected
+
+    def getListItem(self, position):
+        return self.items[position]
+
+    def select(self, position):
+        self.selected = position
+
+
+class AddonDialogWindow(object):
+
+    def __init__(self, title=u""):
+        self.title = title
+        self.controls = []
+        self.actions = {}
+        self.closed = False
+
+    def setGeometry(self, width, height, rows, columns, pos_x=-1,
+                    pos_y=-1):
+        pass
+
+    def placeControl(self, control, row, column, rowspan=1, columnspan=1):
+        self.controls.append(control)
+
+    def connect(self, control, action):
+        self.actions[control if isinstance(control, int)
+                     else id(control)] = action
+
+    def setFocus(self, control):
+        pass
+
+    def press(self, control):
+        '''Runs the function connected to control (a control or action).'''
+        self.actions[control if isinstance(control, int)
+                     else id(control)]()
+
+    def doModal(self):
+        shown.append(self.title)
+
+        for hook in list(modalhooks):
+            if self.closed:
+                break
+            hook(self)
+
+        self.closed = True
+
+    def close(self):
+        self.closed = True
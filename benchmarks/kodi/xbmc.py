@@ -0,0 +1,91 @@
+'''
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program. If not, see <http://www.gnu.org/licenses/>.
+'''
+
+''' Stand in for Kodi's xbmc module so the addon can run headless (see
+    benchmarks.headless).
+
+    Time is virtual: sleep moves the clock on straight away and calls each
+    function in sleephooks with the new time. abortRequested can be set by
+    a hook to stop the service loop.
+'''
+import os
+import tempfile
+
+LOGDEBUG = 0
+LOGINFO = 1
+LOGNOTICE = 2
+LOGWARNING = 3
+LOGERROR = 4
+
+abortRequested = False
+
+# Virtual time in seconds
+now = 0.0
+
+# Functions called with the virtual time after each sleep
+sleephooks = []
+
+# Everything the addon has logged as (level, message)
+logs = []
+
+# Every built in function the addon has run
+builtins = []
+
+# Folder that special:// paths are mapped to
+specialroot = tempfile.mkdtemp(prefix="kodi-")
+
+
+def clock():
+    '''Returns the virtual time.'''
+    return now
+
+
+def sleep(ms):
+    global now
+    now += ms / 1000.0
+
+    for hook in list(sleephooks):
+        hook(now)
+
+
+def log(msg, level=LOGDEBUG):
+    logs.append((level, msg))
+
+
+def executebuiltin(function, wait=False):
+    builtins.append(function)
+
+
+def translatePath(path):
+    if path.startswith("special://"):
+        return os.path.join(specialroot, path[len("special://"):])
+    return path
+
+
+def getInfoLabel(label):
+    return ""
+
+
+def reset():
+    '''Puts everything back to how it was at the start (with a new empty
+    special:// folder).
+    '''
+    global abortRequested, now, specialroot
+    abortRequested = False
+    now = 0.0
+    specialroot = tempfile.mkdtemp(prefix="kodi-")
+    del sleephooks[:]
+    del logs[:]
+    del builtins[:]
@@ -0,0 +1,74 @@
+'''
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program. If not, see <http://www.gnu.org/licenses/>.
+'''
+
+''' Stand in for Kodi's xbmcaddon module. Settings are kept in a dict and
+    strings are read from the addon's strings.po.
+'''
+import os
+import re
+
+ADDON_ID = "service.bbclivefootballscores"
+
+# Root folder of the addon
+ADDON_PATH = os.path.dirname(os.path.dirname(os.path.dirname(
+                                                os.path.abspath(__file__))))
+
+# Settings for each addon id
+# key=addon id
+# value=dict of settings
+settings = {}
+
+_strings = None
+
+
+def strings():
+    '''Returns dict of localised strings from strings.po.'''
+    global _strings
+
+    if _strings is None:
+        _strings = {}
+        path = os.path.join(ADDON_PATH, "resources", "language", "English",
+                            "strings.po")
+        with open(path) as po:
+            for sid, text in re.findall(r'msgctxt "#(\d+)"\s+msgid "(.*)"',
+                                        po.read()):
+                _strings[int(sid)] = text.decode("utf-8")
+
+    return _strings
+
+
+class Addon(object):
+
+    def __init__(self, id=ADDON_ID):
+        self.id = id
+        self.settings = settings.setdefault(id, {})
+
+    def getSetting(self, id):
+        return self.settings.get(id, "")
+
+    def setSetting(self, id, value):
+        self.settings[id] = value
+
+    def getLocalizedString(self, id):
+        return strings().get(id, u"")
+
+    def getAddonInfo(self, id):
+        import xbmc
+        return {"id": self.id,
+                "name": "BBC Football Scores",
+                "path": ADDON_PATH,
+                "profile": xbmc.translatePath(
+                            "special://profile/addon_data/%s/" % (self.id)),
+                "version": "0.0.0"}.get(id, "")
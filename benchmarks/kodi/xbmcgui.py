@@ -0,0 +1,72 @@
+'''
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program. If not, see <http://www.gnu.org/licenses/>.
+'''
+
+''' Stand in for Kodi's xbmcgui module.
+
+    Notifications are recorded. Answers to select/ok/yesno dialogs are
+    taken from the answers list (select returns -1, i.e. cancel, when it's
+    empty).
+'''
+
+# Notifications shown as (heading, message, icon)
+notifications = []
+
+# Answers for dialogs that need one, used in order
+answers = []
+
+
+class Dialog(object):
+
+    def notification(self, heading, message, icon=None, time=5000,
+                     sound=True):
+        notifications.append((heading, message, icon))
+
+    def select(self, heading, items):
+        return answers.pop(0) if answers else -1
+
+    def ok(self, heading, *lines):
+        return True
+
+    def yesno(self, heading, *lines, **kwargs):
+        return answers.pop(0) if answers else False
+
+
+class DialogProgressBG(object):
+
+    def create(self, heading, message=""):
+        pass
+
+    def update(self, percent=0, heading=None, message=None):
+        pass
+
+    def close(self):
+        pass
+
+    def isFinished(self):
+        return True
+
+
+class ListItem(object):
+
+    def __init__(self, label=""):
+        self.label = label
+
+    def getLabel(self):
+        return self.label
+
+
+def reset():
+    del notifications[:]
+    del answers[:]
@@ -0,0 +1,89 @@
+'''
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program. If not, see <http://www.gnu.org/licenses/>.
+'''
+
+''' Measures how much memory is used by each tracked match.
+
+    Run from the addon folder:
+      python -m benchmarks.memory [number of matches]
+'''
+import sys
+
+import BeautifulSoup
+
+from resources.lib.footballscores import (FootballMatch, LiveScoresParser,
+                                          MatchState)
+from benchmarks.fixtures import liveScoresPage, makeMatches
+
+
+def deepSize(obj, seen=None):
+    '''Returns the size in bytes of obj and everything it refers to.
+
+    Objects in seen are not counted (and seen is updated) so shared objects
+    are only counted once. Raises TypeError if a BeautifulSoup object is
+    found as the match objects shouldn't keep hold of the page.
+    '''
+    if seen is None:
+        seen = set()
+
+    if id(obj) in seen or isinstance(obj, type):
+        return 0
+
+    if isinstance(obj, BeautifulSoup.PageElement):
+        raise TypeError("Found reference to page element: %r" % (obj))
+
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+
+    if isinstance(obj, dict):
+        for k, v in obj.items():
+            size += deepSize(k, seen) + deepSize(v, seen)
+
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        for item in obj:
+            size += deepSize(item, seen)
+
+    # namedtuples have a __dict__ property which builds a new dict
+    if hasattr(obj, "__dict__") and not isinstance(obj, tuple):
+        size += deepSize(obj.__dict__, seen)
+
+    for cls in type(obj).__mro__:
+        for slot in getattr(cls, "__slots__", ()):
+            if hasattr(obj, slot):
+                size += deepSize(getattr(obj, slot), seen)
+
+    return size
+
+
+def run(n=200):
+
+    page = liveScoresPage(makeMatches(n))
+    index = LiveScoresParser(page).matches
+    matches = [FootballMatch(row.hometeam, data=index) for row in index]
+
+    # Everything the matches keep hold of
+    total = deepSize(matches)
+
+    state = matches[0].state
+    asdict = dict(zip(MatchState._fields, state))
+
+    print "Matches tracked:           %d" % (len(matches))
+    print "Total size:                %d bytes" % (total)
+    print "Per match:                 %d bytes" % (total // len(matches))
+    print "MatchState snapshot:       %d bytes" % (deepSize(state))
+    print "Same fields in a dict:     %d bytes" % (deepSize(asdict))
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
@@ -0,0 +1,64 @@
+'''
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program. If not, see <http://www.gnu.org/licenses/>.
+'''
+
+''' Compares the streaming LiveScoresParser with building a BeautifulSoup
+    tree of the whole page on the saved fixture pages.
+
+    Run from the addon folder:
+      python -m benchmarks.parser [repeats]
+'''
+import sys
+import timeit
+
+from resources.lib.footballscores import (BeautifulSoup, LiveScoresParser,
+                                          MatchIndex)
+from benchmarks.fixtures import savedPages
+
+
+def soupRows(page):
+    '''The old way: parse the whole page and then index the match table.'''
+    soup = BeautifulSoup(page)
+    return MatchIndex(soup.find("div", {"id": "matches-wrapper"})).rows
+
+
+def streamRows(page):
+    return LiveScoresParser(page).matches.rows
+
+
+def run(repeats=10):
+
+    print "%-24s %8s %12s %12s %8s" % ("page", "matches", "soup (ms)",
+                                       "stream (ms)", "speedup")
+
+    for name, page in savedPages():
+
+        # Make sure both methods give the same answer before timing them
+        rows = soupRows(page)
+        if rows != streamRows(page):
+            raise AssertionError("Parsers disagree on %s" % (name))
+
+        soup = min(timeit.repeat(lambda: soupRows(page), 
+                                 number=1, repeat=repeats))
+        stream = min(timeit.repeat(lambda: streamRows(page), 
+                                   number=1, repeat=repeats))
+
+        print "%-24s %8d %12.2f %12.2f %7.1fx" % (name, len(rows),
+                                                  soup * 1000,
+                                                  stream * 1000,
+                                                  soup / stream)
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 10)
@@ -0,0 +1,262 @@
+'''
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program. If not, see <http://www.gnu.org/licenses/>.
+'''
+
+''' Records the pages requested by the scraping code so that they can be
+    replayed later by benchmarks.replay.
+
+    Each page is kept with the time (in seconds since recording started)
+    that it was seen. A page is only stored again when it changes, so a
+    recording of a whole match day stays small.
+
+    Run from the addon folder to record leagues from the BBC site:
+      python -m benchmarks.recorder folder duration interval league [...]
+'''
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+import urlparse
+from bisect import bisect_right
+
+from resources.lib import footballscores
+
+
+def pageKey(url):
+    '''Returns the part of url that identifies a page (i.e. the path and
+    query string) so that recordings don't depend on the server.
+    '''
+    parts = urlparse.urlsplit(url)
+    return parts.path + ("?" + parts.query if parts.query else "")
+
+
+class Corpus(object):
+    '''Collection of recorded pages.
+
+    Each page is a list of (time, status, body) versions in time order.
+    '''
+
+    def __init__(self):
+        self.pages = {}
+        self.__lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.pages)
+
+    def __contains__(self, url):
+        return pageKey(url) in self.pages
+
+    def add(self, url, t, body, status=200):
+        '''Adds a version of the page at url seen at time t. Nothing is
+        added if the page is the same as the previous version.
+
+        Returns True if the version was added.
+        '''
+        with self.__lock:
+            versions = self.pages.setdefault(pageKey(url), [])
+
+            if versions and versions[-1][1:] == (status, body):
+                return False
+
+            versions.append((t, status, body))
+            versions.sort(key=lambda v: v[0])
+
+        return True
+
+    def lookup(self, url, t):
+        '''Returns (status, body) of the version of the page at url being
+        shown at time t, or None if we don't have one.
+        '''
+        versions = self.pages.get(pageKey(url))
+
+        if not versions:
+            return None
+
+        # Before the first version, show the first one
+        i = max(bisect_right([v[0] for v in versions], t) - 1, 0)
+
+        return versions[i][1:]
+
+    @property
+    def duration(self):
+        '''Time of the last change in the corpus.'''
+        return max([v[-1][0] for v in self.pages.values()] or [0])
+
+    def save(self, folder):
+        '''Writes the corpus to folder (an index.json and a file for each
+        version of each page).
+        '''
+        if not os.path.isdir(folder):
+            os.makedirs(folder)
+
+        index = {}
+
+        for key, versions in sorted(self.pages.items()):
+            name = hashlib.md5(key).hexdigest()[:12]
+            index[key] = []
+
+            for n, (t, status, body) in enumerate(versions):
+                filename = "%s-%03d.html" % (name, n)
+                with open(os.path.join(folder, filename), "wb") as f:
+                    f.write(body)
+                index[key].append([t, status, filename])
+
+        with open(os.path.join(folder, "index.json"), "w") as f:
+            json.dump(index, f, indent=1, sort_keys=True)
+
+    @classmethod
+    def load(cls, folder):
+        '''Reads a corpus written by save.'''
+        corpus = cls()
+
+        with open(os.path.join(folder, "index.json")) as f:
+            index = json.load(f)
+
+        for key, versions in index.items():
+            for t, status, filename in versions:
+                with open(os.path.join(folder, filename), "rb") as f:
+                    corpus.add(key, t, f.read(), status)
+
+        return corpus
+
+
+class Recorder(object):
+    '''Records every page requested through matchcommon.getPage.
+
+    Use as a context manager, or call start and stop:
+
+      with Recorder() as r:
+          League("118996114")
+      r.corpus.save("folder")
+    '''
+
+    def __init__(self, corpus=None, clock=time.time):
+        self.corpus = corpus if corpus is not None else Corpus()
+        self.clock = clock
+        self.urls = []
+        self.__original = None
+        self.__started = None
+
+    def start(self):
+
+        if self.__original is not None:
+            return
+
+        recorder = self
+        original = footballscores.matchcommon.__dict__["getPage"]
+
+        def getPage(self, url, sendresponse=False):
+            response = original(self, url, sendresponse=True)
+            recorder.record(url, response)
+
+            if sendresponse:
+                return response
+
+            if response is not None and response.status < 400:
+                page = response.read()
+                return page.decode("utf-8") if page else None
+
+            return None
+
+        self.__original = original
+        self.__started = self.clock()
+        footballscores.matchcommon.getPage = getPage
+
+    def stop(self):
+
+        if self.__original is not None:
+            footballscores.matchcommon.getPage = self.__original
+            self.__original = None
+
+    def record(self, url, response):
+        '''Adds the response for url to the corpus.
+
+        A "304 Not Modified" answer to one of the session's conditional
+        requests is recorded as the full page it stands for, so the replay
+        server only sends 304s to clients that ask for them.
+        '''
+        self.urls.append(url)
+
+        if response is not None:
+            status = 200 if response.notmodified else response.status
+            self.corpus.add(url,
+                            round(self.clock() - self.__started, 3),
+                            response.read(),
+                            status)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def recordLeagues(folder, leagues, duration, interval=60):
+    '''Follows leagues (with goal scorers and bookings) for duration
+    seconds, checking them every interval seconds, and saves everything
+    that was downloaded to folder. The league tables and the list of
+    competitions are recorded at the start.
+    '''
+    with Recorder() as recorder:
+
+        footballscores.getAllLeagues()
+
+        table = footballscores.LeagueTable()
+        for league in leagues:
+            try:
+                table.getLeagueTable("competition-%s" % (league))
+            except Exception, e:
+                print "Unable to get table for %s: %s" % (league, e)
+
+        following = [footballscores.League(l, detailed=True)
+                     for l in leagues]
+
+        for league in following:
+            for match in league.LeagueMatches:
+                match.getTeamBadges()
+
+        end = time.time() + duration
+
+        while time.time() < end:
+            time.sleep(interval)
+            footballscores.pagecache.invalidate()
+
+            for league in following:
+                # Try again next time rather than losing the recording
+                try:
+                    league.Update()
+                except footballscores.FetchError, e:
+                    print "Unable to update %s: %s" % (league.LeagueID, e)
+
+            print "%d pages, %d requests" % (len(recorder.corpus),
+                                             len(recorder.urls))
+
+    recorder.corpus.save(folder)
+
+    return recorder.corpus
+
+
+if __name__ == "__main__":
+
+    if len(sys.argv) < 5:
+        print __doc__
+        sys.exit(1)
+
+    recordLeagues(sys.argv[1],
+                  sys.argv[4:],
+                  float(sys.argv[2]),
+                  float(sys.argv[3]))
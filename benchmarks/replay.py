@@ -0,0 +1,433 @@
+'''
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program. If not, see <http://www.gnu.org/licenses/>.
+'''
+
+''' Local stand in for the BBC site which replays a recorded (or made up)
+    match day so the scraping code can be measured without the network.
+
+    The server has its own match day clock. Each request gets the version of
+    the page that was current at that time. The clock can run at any speed
+    or be moved by hand (seek/advance). Latency and errors can be added to
+    see how the addon copes with a slow or unreliable site.
+
+      with ReplayServer(matchDay()) as server:
+          league = League("118996114")
+          server.advance(600)
+          league.Update()
+
+    Run from the addon folder to serve a recording (or a made up match day
+    if no folder is given) until interrupted:
+      python -m benchmarks.replay [folder] [port] [speed]
+'''
+import BaseHTTPServer
+import SocketServer
+import hashlib
+import random
+import socket
+import sys
+import threading
+import time
+import urlparse
+from collections import Counter
+
+from resources.lib import footballscores
+from benchmarks import fixtures
+from benchmarks.recorder import Corpus, pageKey
+
+# The links which are pointed at the replay server by redirect
+# Format is (class, attribute)
+LINKS = [(footballscores.matchcommon, "siteroot"),
+         (footballscores.matchcommon, "livescoreslink"),
+         (footballscores.FootballMatch, "detailprefix"),
+         (footballscores.League, "accordionlink"),
+         (footballscores.LeagueTable, "leaguebase"),
+         (footballscores.UKClock, "timeurl")]
+
+
+class ReplayHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+
+    # Keep-alive so that HTTPSession can reuse its connections
+    protocol_version = "HTTP/1.1"
+
+    # Send each response in one go rather than a line at a time, which
+    # adds delays on a kept-alive connection
+    wbufsize = -1
+
+    def setup(self):
+        BaseHTTPServer.BaseHTTPRequestHandler.setup(self)
+        self.server.track(self.connection, True)
+
+    def finish(self):
+        try:
+            BaseHTTPServer.BaseHTTPRequestHandler.finish(self)
+        finally:
+            self.server.track(self.connection, False)
+
+    def do_GET(self):
+        replay = self.server.replay
+        status, body = replay.respond(self.path)
+
+        etag = '"%s"' % (hashlib.md5(body).hexdigest())
+
+        if status == 200 and self.headers.get("If-None-Match") == etag:
+            replay.count("notmodified")
+            status, body = 304, ""
+
+        self.send_response(status)
+        if status in (200, 304):
+            self.send_header("ETag", etag)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        self.wfile.flush()
+
+    def log_message(self, *args):
+        pass
+
+
+class ReplayHTTPServer(SocketServer.ThreadingMixIn,
+                       BaseHTTPServer.HTTPServer):
+
+    daemon_threads = True
+
+    def __init__(self, *args, **kwargs):
+        BaseHTTPServer.HTTPServer.__init__(self, *args, **kwargs)
+        self.connections = set()
+        self.__lock = threading.Lock()
+
+    def track(self, connection, active):
+        '''Keeps track of the open client connections so that they can be
+        closed when the server stops.
+        '''
+        with self.__lock:
+            if active:
+                self.connections.add(connection)
+            else:
+                self.connections.discard(connection)
+
+    def closeConnections(self):
+        with self.__lock:
+            connections = list(self.connections)
+
+        for connection in connections:
+            try:
+                connection.shutdown(socket.SHUT_RDWR)
+            except socket.error:
+                pass
+
+    def handle_error(self, request, client_address):
+
+        # Clients closing their connections (e.g. HTTPSession.close) aren't
+        # worth reporting
+        error = sys.exc_info()[0]
+        if error is not None and not issubclass(error, socket.error):
+            BaseHTTPServer.HTTPServer.handle_error(self, request,
+                                                   client_address)
+
+
+class ReplayServer(object):
+    '''Serves the pages in a Corpus.
+
+    corpus      - benchmarks.recorder.Corpus to serve
+    latency     - seconds added to every response
+    jitter      - up to this many more seconds are added at random
+    errorrate   - fraction of requests that get a 503 error
+    speed       - match day seconds that pass each real second (0 means the
+                  clock only moves with seek and advance)
+    seed        - seed for the random latency and errors
+    '''
+
+    def __init__(self, corpus, latency=0, jitter=0, errorrate=0, speed=0,
+                 seed=0, port=0):
+        self.corpus = corpus
+        self.latency = latency
+        self.jitter = jitter
+        self.errorrate = errorrate
+        self.speed = speed
+        self.port = port
+        self.base = None
+
+        self.__random = random.Random(seed)
+        self.__lock = threading.Lock()
+        self.__offset = 0
+        self.__started = time.time()
+        self.__server = None
+        self.__links = None
+
+        self.resetStats()
+
+    @property
+    def now(self):
+        '''Current match day time in seconds.'''
+        with self.__lock:
+            return (self.__offset +
+                    (time.time() - self.__started) * self.speed)
+
+    def seek(self, t):
+        '''Moves the match day clock to t seconds.'''
+        with self.__lock:
+            self.__offset = t
+            self.__started = time.time()
+
+    def advance(self, seconds):
+        '''Moves the match day clock on by seconds.'''
+        self.seek(self.now + seconds)
+
+    def count(self, counter, n=1):
+        with self.__lock:
+            self.__stats[counter] += n
+
+    def stats(self):
+        '''Returns a dict of request counts etc since the last reset.'''
+        with self.__lock:
+            stats = dict(self.__stats)
+            stats["pages"] = Counter(self.__pages)
+
+        return stats
+
+    def resetStats(self):
+        with self.__lock:
+            self.__stats = Counter(requests=0, bytes=0, errors=0,
+                                   notfound=0, notmodified=0)
+            self.__pages = Counter()
+
+    def respond(self, path):
+        '''Returns (status, body) for a request for path, after any latency
+        and error injection.
+        '''
+        with self.__lock:
+            delay = self.latency + self.__random.uniform(0, self.jitter)
+            failed = self.__random.random() < self.errorrate
+
+        if delay:
+            time.sleep(delay)
+
+        self.count("requests")
+
+        if failed:
+            self.count("errors")
+            return 503, ""
+
+        page = self.corpus.lookup(path, self.now)
+
+        if page is None:
+            self.count("notfound")
+            return 404, ""
+
+        with self.__lock:
+            self.__pages[pageKey(path)] += 1
+
+        self.count("bytes", len(page[1]))
+
+        return page
+
+    def start(self):
+        '''Starts serving in a background thread. Returns the base url.'''
+        self.__server = ReplayHTTPServer(("127.0.0.1", self.port),
+                                         ReplayHandler)
+        self.__server.replay = self
+
+        t = threading.Thread(target=self.__server.serve_forever)
+        t.daemon = True
+        t.start()
+
+        self.base = "http://127.0.0.1:%d" % (self.__server.server_address[1])
+        self.seek(self.__offset)
+
+        return self.base
+
+    def stop(self):
+        if self.__server:
+            # Close the kept-alive connections first so that their handler
+            # threads finish now rather than at interpreter shutdown
+            footballscores.session.close()
+            self.__server.closeConnections()
+            self.__server.shutdown()
+            self.__server.server_close()
+            self.__server = None
+
+    def redirect(self):
+        '''Points the links used by footballscores at this server.'''
+        if self.__links is None:
+            self.__links = [(cls, name, cls.__dict__[name])
+                            for cls, name in LINKS]
+
+        for cls, name, link in self.__links:
+            parts = urlparse.urlsplit(link)
+            setattr(cls, name,
+                    self.base + link[len(parts.scheme + "://" +
+                                         parts.netloc):])
+
+        # Don't use anything downloaded from somewhere else
+        footballscores.pagecache.invalidate()
+
+    def restore(self):
+        '''Puts the links back to where they were before redirect.'''
+        if self.__links is not None:
+            for cls, name, link in self.__links:
+                setattr(cls, name, link)
+            self.__links = None
+
+        footballscores.pagecache.invalidate()
+
+    def __enter__(self):
+        self.start()
+        self.redirect()
+        return self
+
+    def __exit__(self, *exc):
+        self.restore()
+        self.stop()
+
+
+def matchTimeline(match, kickoff, rand):
+    '''Adds the goals and cards for match and returns a function which
+    gives the match dict and incidents at a given time.
+    '''
+    incidents = []
+
+    for _ in range(rand.randint(0, 5)):
+        incidents.append((rand.randint(1, 90),
+                          rand.choice(["home", "away"]),
+                          "goal"))
+
+    for _ in range(rand.randint(0, 4)):
+        incidents.append((rand.randint(1, 90),
+                          rand.choice(["home", "away"]),
+                          rand.choice(["yellow", "yellow", "yellow", "red"])))
+
+    incidents.sort()
+
+    def at(t):
+        played = (t - kickoff) // 60
+
+        if played < 0:
+            state, minute = "fixture", 0
+        elif played < 45:
+            state, minute = "live", played + 1
+        elif played < 60:
+            state, minute = "halftime", 45
+        elif played < 105:
+            state, minute = "live", played - 14
+        else:
+            state, minute = "report", 90
+
+        seen = [(team, incidenttype,
+                 u"Player %d" % (n), u"%d'" % (m))
+                for n, (m, team, incidenttype) in enumerate(incidents)
+                if m <= minute and state != "fixture"]
+
+        m = dict(match)
+        m.update(state=state,
+                 minute=minute,
+                 homescore=len([i for i in seen
+                                if i[0] == "home" and i[1] == "goal"]),
+                 awayscore=len([i for i in seen
+                                if i[0] == "away" and i[1] == "goal"]))
+
+        return m, seen
+
+    return at
+
+
+def matchDay(leagues=3, matches=10, duration=8400, step=60, teams=20,
+             seed=0):
+    '''Returns a Corpus for a made up match day.
+
+    leagues     - number of competitions (up to 6)
+    matches     - number of matches in each competition
+    duration    - length of the match day in seconds
+    step        - pages change at most this often (seconds)
+    teams       - number of teams in each league table
+
+    Most matches kick off at the start of the day; every fourth one kicks
+    off an hour later. Scores, match times and incidents change as the
+    day goes on.
+    '''
+    rand = random.Random(seed)
+    corpus = Corpus()
+    competitions = fixtures.COMPETITIONS[:leagues]
+
+    livelink = footballscores.matchcommon.livescoreslink
+    detaillink = footballscores.FootballMatch.detailprefix
+    tablelink = footballscores.LeagueTable.leaguebase
+
+    # Build the matches and their timelines
+    timelines = []
+    for n, (cid, name) in enumerate(competitions):
+        for i in range(matches):
+            match = fixtures.makeMatch(n * matches + i)
+            kickoff = 3600 if i % 4 == 3 else 0
+            match["kickoff"] = "16:00" if kickoff else "15:00"
+            timelines.append((cid, match, matchTimeline(match, kickoff,
+                                                        rand)))
+
+    # Pages which don't change during the day
+    corpus.add(tablelink, 0, fixtures.tablesPage(
+                                competitions=competitions).encode("utf-8"))
+
+    for cid, name in competitions:
+        corpus.add("%s?filter=competition-%s" % (tablelink, cid), 0,
+                   fixtures.tablesPage(cid, teams=teams,
+                                       competitions=competitions)
+                   .encode("utf-8"))
+
+    for cid, match, _ in timelines:
+        corpus.add("/sport/football/%s" % (match["id"][4:]), 0,
+                   fixtures.matchPage(match).encode("utf-8"))
+
+    # Pages which change as the matches are played
+    for t in range(0, duration + 1, step):
+
+        current = [(cid, at(t)) for cid, _, at in timelines]
+        dropdown = [(cid, name, matches) for cid, name in competitions]
+
+        for cid, name in competitions:
+            page = fixtures.liveScoresPage([m for c, (m, _) in current
+                                            if c == cid],
+                                           competition=cid,
+                                           competitions=dropdown)
+            corpus.add(livelink.format(comp=cid), t, page.encode("utf-8"))
+
+        page = fixtures.liveScoresPage([m for _, (m, _) in current],
+                                       competitions=dropdown)
+        corpus.add(livelink.format(comp=""), t, page.encode("utf-8"))
+
+        for _, (match, incidents) in current:
+            corpus.add(detaillink.format(id=match["id"]), t,
+                       fixtures.incidentsPage(incidents).encode("utf-8"))
+
+    return corpus
+
+
+if __name__ == "__main__":
+
+    if len(sys.argv) > 1 and sys.argv[1] != "-":
+        corpus = Corpus.load(sys.argv[1])
+    else:
+        corpus = matchDay()
+
+    port = int(sys.argv[2]) if len(sys.argv) > 2 else 8080
+    speed = float(sys.argv[3]) if len(sys.argv) > 3 else 1
+
+    server = ReplayServer(corpus, speed=speed, port=port)
+    print "Serving %d pages at %s" % (len(corpus), server.start())
+
+    try:
+        while True:
+            time.sleep(60)
+            print "%6ds %r" % (server.now, server.stats())
+    except KeyboardInterrupt:
+        server.stop()
@@ -0,0 +1,392 @@
+'''
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program. If not, see <http://www.gnu.org/licenses/>.
+'''
+
+''' Benchmarks the main scraping operations against a replayed match day.
+
+    Each operation is run at several scales (number of matches in each
+    league) and the following are reported:
+      wall      - elapsed time
+      parse     - time spent building LiveScoresParser/BeautifulSoup objects
+                  (added up over all threads so it can be more than wall
+                  when pages are parsed at the same time)
+      objects   - number of new instances of the addon's own classes
+                  (matches, rows, cached responses etc) still alive when
+                  the operation finishes (i.e. what it allocated and kept)
+      requests  - number of requests made to the server
+
+    The median of the repeats is used for each of these.
+
+    How fast the same code runs depends on whatever else the machine is
+    doing, so every run also times a fixed amount of parsing (the
+    calibration). Times are compared with the baselines as multiples of the
+    calibration time rather than in seconds.
+
+    The results are compared with the saved baselines and anything which
+    is worse by more than the threshold (or the time threshold, for times)
+    is reported as a regression.
+
+    Run from the addon folder:
+      python -m benchmarks.suite [--repeats N] [--threshold PERCENT]
+                                 [--time-threshold PERCENT]
+                                 [--save] [--baselines FILE]
+
+    --save writes the results as the new baselines. Times depend on the
+    machine so save baselines on the machine used for the comparisons.
+'''
+import gc
+import json
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+from resources.lib import footballscores
+from benchmarks import fixtures
+from benchmarks.replay import ReplayServer, matchDay
+
+BASELINES = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                         "baselines.json")
+
+# Number of matches in each league
+SCALES = (5, 20, 100)
+
+# Number of leagues in the match day
+LEAGUES = 3
+
+# Percentage by which a result can be worse than its baseline
+THRESHOLD = 25
+
+# Times still vary more than that from run to run, even when calibrated
+TIMETHRESHOLD = 50
+
+# Times (in seconds) are only compared when the baseline is at least this
+# long, otherwise they're mostly noise
+MINTIME = 0.002
+
+# Object counts can vary a little from run to run so they have to go up
+# by at least this many as well
+MINOBJECTS = 10
+
+# Match day times to use for the start of the day and for updates
+START = 1200
+LATER = 3000
+
+# League used for the single league operations
+LEAGUE = "118996114"
+
+
+class ParseTimer(object):
+    '''Adds up the time spent parsing pages while it's active.'''
+
+    def __init__(self):
+        self.total = 0
+        self.__lock = threading.Lock()
+        self.__originals = {}
+
+    def __timed(self, func):
+
+        def wrapper(*args, **kwargs):
+            start = time.time()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                with self.__lock:
+                    self.total += time.time() - start
+
+        return wrapper
+
+    def __enter__(self):
+        for name in ("LiveScoresParser", "BeautifulSoup"):
+            self.__originals[name] = getattr(footballscores, name)
+            setattr(footballscores, name,
+                    self.__timed(self.__originals[name]))
+        return self
+
+    def __exit__(self, *exc):
+        for name, original in self.__originals.items():
+            setattr(footballscores, name, original)
+
+
+# Page parsed to calibrate the times
+CALIBRATION_PAGE = fixtures.liveScoresPage([fixtures.makeMatch(i)
+                                            for i in range(50)])
+
+
+def calibrate():
+    '''Returns the time taken to parse CALIBRATION_PAGE.'''
+    start = time.time()
+    footballscores.LiveScoresParser(CALIBRATION_PAGE)
+    return time.time() - start
+
+
+def countObjects():
+    '''Returns the number of live instances of classes defined in
+    footballscores. Counting everything would include threads, sockets
+    etc which vary from run to run.
+    '''
+    gc.collect()
+    return sum(1 for o in gc.get_objects()
+               if type(o).__module__ == footballscores.__name__)
+
+
+def median(values):
+    values = sorted(values)
+    middle = len(values) // 2
+
+    if len(values) % 2:
+        return values[middle]
+
+    return (values[middle - 1] + values[middle]) / 2.0
+
+
+def lastTeam():
+    '''Returns the home team of the last match of the day (i.e. the one
+    which takes longest to find).
+    '''
+    rows = footballscores.matchcommon().getLiveScores().matches.rows
+    return rows[-1].hometeam
+
+
+# Each operation is a function taking the ReplayServer which sets up
+# anything that shouldn't be measured and returns the function to measure.
+
+def opLeague(server):
+    return lambda: footballscores.League(LEAGUE)
+
+
+def opLeagueUpdate(server):
+    league = footballscores.League(LEAGUE, detailed=True)
+    server.seek(LATER)
+    footballscores.pagecache.invalidate()
+    return league.Update
+
+
+def opFindMatch(server):
+    team = lastTeam()
+    footballscores.pagecache.invalidate()
+    return lambda: footballscores.FootballMatch(team)
+
+
+def opLeagueTable(server):
+    table = footballscores.LeagueTable()
+    return lambda: table.getLeagueTable("competition-%s" % (LEAGUE))
+
+
+def opTeams(server):
+    return footballscores.Teams().getTeams
+
+
+def opAllLeagues(server):
+    return footballscores.getAllLeagues
+
+
+OPERATIONS = OrderedDict([("League", opLeague),
+                          ("League.Update", opLeagueUpdate),
+                          ("FootballMatch.findMatch", opFindMatch),
+                          ("LeagueTable.getLeagueTable", opLeagueTable),
+                          ("Teams.getTeams", opTeams),
+                          ("getAllLeagues", opAllLeagues)])
+
+
+def measure(server, setup, repeats=5):
+    '''Runs an operation repeats times and returns a dict of results.
+
+    The median of each measure is used so that one run slowed down by
+    whatever else is running doesn't count (nor does one lucky run).
+    '''
+    runs = {}
+
+    for _ in range(repeats):
+
+        # Every run starts with nothing cached
+        server.seek(START)
+        footballscores.pagecache.invalidate()
+        footballscores.session.close()
+
+        func = setup(server)
+
+        before = countObjects()
+        server.resetStats()
+
+        calibration = calibrate()
+
+        with ParseTimer() as parse:
+            start = time.time()
+            result = func()
+            wall = time.time() - start
+
+        # Something else running only ever makes it slower
+        calibration = min(calibration, calibrate())
+
+        requests = server.stats()["requests"]
+
+        objects = countObjects() - before
+        del result
+
+        for measure, value in (("wall", wall),
+                               ("parse", parse.total),
+                               ("objects", objects),
+                               ("requests", requests),
+                               ("calibration", calibration)):
+            runs.setdefault(measure, []).append(value)
+
+    return dict((measure, median(values))
+                for measure, values in runs.items())
+
+
+def run(scales=SCALES, repeats=5):
+    '''Runs every operation at every scale.
+
+    Returns a dict of {"operation@scale": results}.
+    '''
+    results = OrderedDict()
+
+    for n in scales:
+        corpus = matchDay(leagues=LEAGUES, matches=n, teams=n)
+
+        with ReplayServer(corpus) as server:
+            for name, setup in OPERATIONS.items():
+                results["%s@%d" % (name, n)] = measure(server, setup,
+                                                       repeats)
+
+    return results
+
+
+def compare(results, baselines, threshold=THRESHOLD,
+            timethreshold=TIMETHRESHOLD):
+    '''Returns a list of (key, measure, baseline, result) for each result
+    which is worse than its baseline by more than threshold percent (or
+    timethreshold percent for times).
+    '''
+    regressions = []
+
+    for key, result in results.items():
+        baseline = baselines.get(key)
+        if not baseline:
+            continue
+
+        for measure, value in sorted(result.items()):
+            old = baseline.get(measure)
+
+            if old is None:
+                continue
+
+            if measure == "calibration":
+                continue
+
+            if measure in ("wall", "parse"):
+                if old < MINTIME:
+                    continue
+
+                # Compare the times relative to how fast the machine was
+                if result.get("calibration") and baseline.get("calibration"):
+                    value /= result["calibration"]
+                    old /= baseline["calibration"]
+
+                if value > old * (1 + timethreshold / 100.0):
+                    regressions.append((key, measure, old, value))
+
+                continue
+
+            if measure == "objects" and value - old < MINOBJECTS:
+                continue
+
+            if value > old * (1 + threshold / 100.0) and value > old:
+                regressions.append((key, measure, old, value))
+
+    return regressions
+
+
+def report(results, baselines):
+
+    print "%-32s %10s %10s %9s %9s %9s" % ("operation", "wall (ms)",
+                                           "parse (ms)", "objects",
+                                           "requests", "vs base")
+
+    for key, result in results.items():
+        baseline = baselines.get(key)
+
+        if baseline and baseline["wall"]:
+            change = "%+8.0f%%" % ((result["wall"] / baseline["wall"] - 1)
+                                   * 100)
+        else:
+            change = "%9s" % ("-")
+
+        print "%-32s %10.2f %10.2f %9d %9d %s" % (key,
+                                                  result["wall"] * 1000,
+                                                  result["parse"] * 1000,
+                                                  result["objects"],
+                                                  result["requests"],
+                                                  change)
+
+
+def loadBaselines(path=BASELINES):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (IOError, ValueError):
+        return {}
+
+
+def saveBaselines(results, path=BASELINES):
+    with open(path, "w") as f:
+        json.dump(results, f, indent=1)
+
+
+def main(args):
+
+    repeats = 5
+    threshold = THRESHOLD
+    timethreshold = TIMETHRESHOLD
+    save = False
+    path = BASELINES
+
+    while args:
+        arg = args.pop(0)
+        if arg == "--repeats":
+            repeats = int(args.pop(0))
+        elif arg == "--threshold":
+            threshold = float(args.pop(0))
+        elif arg == "--time-threshold":
+            timethreshold = float(args.pop(0))
+        elif arg == "--save":
+            save = True
+        elif arg == "--baselines":
+            path = args.pop(0)
+        else:
+            print __doc__
+            return 2
+
+    results = run(repeats=repeats)
+    baselines = loadBaselines(path)
+
+    report(results, baselines)
+
+    if save:
+        saveBaselines(results, path)
+        print "Saved baselines to %s" % (path)
+        return 0
+
+    regressions = compare(results, baselines, threshold, timethreshold)
+
+    for key, measure, old, new in regressions:
+        print "REGRESSION: %s %s %.4g -> %.4g" % (key, measure, old, new)
+
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -24,6 +24,8 @@
 
 import os
 import sys
+import threading
+import time
 
 if sys.version_info >=  (2, 7):
     import json as json
@@ -34,7 +36,10 @@ import xbmc
 import xbmcaddon
 import xbmcgui
 
-from resources.lib.footballscores import League
+from resources.lib.footballscores import (League, PollScheduler, pagecache,
+                                          session, runConcurrently, timings,
+                                          RequestCancelled, saveFile,
+                                          EVENT_GOAL, EVENT_STATUS)
 
 # Set the addon environment
 _A_ = xbmcaddon.Addon()
@@ -56,6 +61,27 @@ STATUS_DICT = {"FT": ["Full Time", IMG_FT],
               "HT": ["Half Time", IMG_HT],
               "L": ["Latest", IMG_LATEST],
               "Fixture": ["Fixture", IMG_FIXTURE]}
+
+# Maximum number of leagues to update at the same time
+UPDATE_WORKERS = 8
+
+# Seconds allowed for updating the leagues in each cycle. Leagues which
+# aren't updated in time keep their previous data and are tried again on
+# the next cycle.
+CYCLE_DEADLINE = 30
+
+# Set when XBMC is shutting down so that no more leagues are started
+stopping = threading.Event()
+
+# File used to save the leagues between sessions so we can show the last
+# known scores as soon as the service starts
+SNAPSHOT_FILE = os.path.join(
+                    xbmc.translatePath(_A_.getAddonInfo("profile")),
+                    "snapshot.json")
+
+# Ignore snapshots older than this (seconds)
+SNAPSHOT_MAX_AGE = 12 * 60 * 60
+
 def localise(id):
     '''Gets localised string.
 
@@ -101,6 +127,26 @@ def checkAlerts():
 
     return _S_("Alerts") != "true"
 
+def getStatsInterval():
+    '''Returns how often (in minutes) the timing statistics should be
+    written to the log. 0 means never.
+    '''
+
+    try:
+        return int(_S_("StatsInterval"))
+    except ValueError:
+        return 0
+
+def logStats():
+    '''Writes the timing statistics to the XBMC log and starts collecting
+    them afresh.
+    '''
+
+    for line in timings.summary():
+        xbmc.log(u"bbclivefootballscores: {0}".format(line), xbmc.LOGNOTICE)
+
+    timings.resetStats()
+
 def serviceRunning():
     '''User should be able to deactivate alerts (rather than deactivating
         the service) via setting.
@@ -110,6 +156,38 @@ def serviceRunning():
 
     return True
 
+def watchForAbort():
+    '''Waits for XBMC to start shutting down and then cancels any updates
+    in progress so the service can stop straight away.
+    '''
+
+    while not xbmc.abortRequested:
+        time.sleep(0.2)
+
+    stopping.set()
+    session.cancel()
+
+def runLeagues(func, leagues):
+    '''Calls func for each league in leagues at the same time, giving up
+    on any that are still waiting for the BBC site at the cycle deadline.
+
+    Takes 2 arguments:
+    func:       function taking a league ID
+    leagues:    list of league IDs
+
+    Returns a list of results in the same order as leagues. A league which
+    failed has its exception in place of a result and one which wasn't
+    started because XBMC is shutting down has None.
+    '''
+
+    session.setDeadline(time.time() + CYCLE_DEADLINE)
+
+    try:
+        return runConcurrently(func, leagues, workers=UPDATE_WORKERS,
+                               stop=stopping)
+    finally:
+        session.setDeadline(None)
+
 def updateWatchedLeagues(matchdict, selectedleagues):
     '''Updates our active leagues to make sure that we're just looking at the
     leagues that the user wants.
@@ -129,14 +207,19 @@ def updateWatchedLeagues(matchdict, selectedleagues):
     # list of leagues selected by users
     removedleagues = [l for l in matchdict if l not in selectedleagues]
 
+    # Create League objects for the new leagues. Each one needs its own
+    # page so we can get them at the same time.
+    leagues = runLeagues(League, newleagues)
+
     # Loop through new leagues
-    for l in newleagues:
+    for l, league in zip(newleagues, leagues):
 
-        # Add a League object to the dictioanary
-        try:
-            matchdict[l] = League(l)
-        except TypeError:
-            pass
+        # Add a League object to the dictioanary (a league which fails here
+        # will be tried again next time)
+        if isinstance(league, Exception):
+            debug("Unable to load {0}: {1}".format(l, league))
+        elif league is not None:
+            matchdict[l] = league
 
     # Loop through leaues to be removed
     for l in removedleagues:
@@ -147,6 +230,75 @@ def updateWatchedLeagues(matchdict, selectedleagues):
     # Return the dictionary
     return matchdict
 
+def loadSnapshot(selectedleagues):
+    '''Builds a dictionary of leagues from the last saved snapshot.
+
+    Leagues are only restored if the user is still watching them and the
+    snapshot is recent. The restored leagues are refreshed as soon as the
+    main loop starts.
+
+    Takes one argument:
+    selectedleagues:    list of league IDs chosen by user
+
+    Returns dictionary of leagues (empty if there's no usable snapshot).
+    '''
+
+    matchdict = {}
+
+    try:
+        with open(SNAPSHOT_FILE, "r") as snapfile:
+            snapshot = json.load(snapfile)
+
+        if time.time() - snapshot["saved"] > SNAPSHOT_MAX_AGE:
+            debug("Snapshot is too old - ignoring")
+            return matchdict
+
+        for league in snapshot["leagues"]:
+            if league["id"] in selectedleagues:
+                matchdict[league["id"]] = League.fromSnapshot(league)
+
+    # No snapshot yet, or it's unreadable. Either way we just start afresh.
+    except (IOError, ValueError, KeyError, TypeError), e:
+        debug("Unable to load snapshot: {0}".format(e))
+        matchdict = {}
+
+    return matchdict
+
+def saveSnapshot(matchdict):
+    '''Saves the current state of our leagues so that they can be shown
+    straight away when the service next starts.
+
+    Takes one argument:
+    matchdict:  dictionary of leagues being watched
+    '''
+
+    snapshot = {"saved": time.time(),
+                "leagues": [matchdict[l].snapshot() for l in sorted(matchdict)]}
+
+    try:
+        saveFile(SNAPSHOT_FILE, json.dumps(snapshot))
+
+    except (IOError, OSError), e:
+        debug("Unable to save snapshot: {0}".format(e))
+
+def updateTicker(matchdict):
+    '''Sets the ticker text for all the leagues being watched.
+
+    Takes one argument:
+    matchdict:  dictionary of leagues being watched
+    '''
+
+    ticker = u""
+
+    # Always show the leagues in the same order
+    for league in sorted(matchdict):
+        ticker += u"[B]{0}[/B]: ".format(matchdict[league].LeagueName)
+        ticker += u", ".join(unicode(m) 
+                            for m in matchdict[league].LeagueMatches)
+
+    debug(ticker)
+    xbmc.executebuiltin(u"skin.setstring(tickertext,{0})".format(ticker))
+
 def Notify(subject, message, image=None):
     '''Displays match notification.
 
@@ -157,59 +309,107 @@ def Notify(subject, message, image=None):
     '''
     xbmcgui.Dialog().notification(subject, message, image, 2000)
 
-def checkMatch(match):
-    '''Look at the match and work out what notification we want to show.
+def checkEvent(event):
+    '''Work out what notification we want to show for a change to a match.
 
     Takes one argument:
-    match:  footballscores.FootballMatch object
+    event:  footballscores.MatchEvent object
     '''
 
+    match = event.match
+
     # Has there been a goal?
-    if match.Goal:
+    if event.event == EVENT_GOAL:
 
         # Gooooooooooooooooooooooooooooollllllllllllllll!
         Notify("GOAL!", str(match), IMG_GOAL)
-        debug("GOAL: %s" % (match))
+        debug(u"GOAL: %s" % (match))
 
     # Has the status changed? e.g. kick-off, half-time, full-time?
-    if match.StatusChanged:
+    elif event.event == EVENT_STATUS:
 
         # Get the relevant status info
         info = STATUS_DICT.get(match.status, STATUS_DICT["Fixture"])
 
         # Send the notification
         Notify(info[0], str(match), info[1])
-        debug("STATUS: %s" % (match))
+        debug(u"STATUS: %s" % (match))
 
-def doUpdates(matchdict):
+def doUpdates(matchdict, scheduler):
     '''Main function to updated leagues and check matches for updates.
 
-    Takes one argument:
+    Only leagues which the scheduler says are due are updated.
+
+    Takes two arguments:
     matchdict:  dictionary of leagues being watchedleagues
+    scheduler:  PollScheduler object
 
     Returns updated dictionary
     '''
 
-    ticker = u""
+    # Always process the leagues in the same order
+    leagues = sorted(matchdict)
+
+    # Which leagues need checking now?
+    dueleagues = scheduler.due(leagues)
+
+    if not dueleagues:
+        return matchdict
+
+    start = time.time()
+
+    # Make sure we don't use any pages left over from the last cycle
+    pagecache.invalidate()
+
+    def updateLeague(league):
+        with timings.timer("league", league):
+            return matchdict[league].Update()
+
+    # Get each league to update its matches. The leagues are independent
+    # so we can fetch them all at the same time.
+    results = runLeagues(updateLeague, dueleagues)
+    results = dict(zip(dueleagues, results))
 
     # Loop through each league that we're following
-    for league in matchdict:
+    for league in leagues:
 
-        
-        # Get the league to update each match
-        matchdict[league].Update()
+        if league in results:
 
-        ticker += u"[B]{0}[/B]: ".format(matchdict[league].LeagueName)
-        ticker += u", ".join(unicode(m) for m in matchdict[league].LeagueMatches)
+            # The league ran out of time (or wasn't started because we're
+            # shutting down). It keeps its previous data and, as it isn't
+            # scheduled, it's still due on the next cycle.
+            if (results[league] is None or 
+                isinstance(results[league], RequestCancelled)):
+                debug("Update of {0} didn't finish: {1}".format(
+                                                    league, results[league]))
+                continue
 
-        # Loop through the matches
-        for match in matchdict[league].LeagueMatches:
+            # Something went wrong but the league keeps its previous data.
+            # That data may be out of date so try again soon.
+            elif isinstance(results[league], Exception):
+                debug("Error updating {0}: {1}".format(league, 
+                                                       results[league]))
+                scheduler.retry(league)
+                continue
 
-            # and check it for updates
-            checkMatch(match)
+            else:
+                with timings.timer("notify", league):
 
-    debug(ticker)
-    xbmc.executebuiltin(u"skin.setstring(tickertext,{0})".format(ticker))
+                    # Loop through the changes found by the update
+                    for event in results[league]:
+
+                        # and check whether we need to tell the user
+                        checkEvent(event)
+
+            # Work out when we next need to look at this league
+            scheduler.schedule(league, matchdict[league])
+
+    updateTicker(matchdict)
+
+    # Keep a copy of the latest scores for the next time we start
+    saveSnapshot(matchdict)
+
+    timings.add("cycle", time.time() - start)
 
     # Return the updated dicitonary object
     return matchdict
@@ -218,38 +418,69 @@ def doUpdates(matchdict):
 # Script starts here.
 # Let's get some initial data before we enter main service loop
 
+# Cancel any updates that are running when XBMC starts shutting down
+abortwatcher = threading.Thread(target=watchForAbort)
+abortwatcher.daemon = True
+abortwatcher.start()
+
+# Start with the leagues we saved last time so the ticker can be shown
+# straight away. These are refreshed on the first pass of the main loop.
+selectedleagues = getSelectedLeagues()
+matchdict = loadSnapshot(selectedleagues)
+
+if matchdict:
+    debug("Restored from snapshot - {0}".format(matchdict))
+    updateTicker(matchdict)
+
 # Build dictionary of leagues we want to follow
-matchdict = updateWatchedLeagues({}, getSelectedLeagues())
+matchdict = updateWatchedLeagues(matchdict, selectedleagues)
 debug("LeagueList - {0}".format(matchdict))
 
 # Check if we need to show alerts or not.
 alerts = checkAlerts()
 
-# Variable for counting loop iterations
+# Decides how often each league is checked
+scheduler = PollScheduler()
+
+# How often to log the timing statistics
+statsinterval = getStatsInterval()
+
+# Variables for counting loop iterations
 i = 0
+statscount = 0
 
 # Main service loop - need to exit script cleanly if XBMC is shutting down
 debug("Entering main loop...")
+
 while not xbmc.abortRequested:
 
-    # 5 seconds before we do main update, let's check and see if there are any
+    # Once a minute, let's check and see if there are any
     # new leagues that we need to follow.
     # Also, check whether the user has enabled/disabled alerts
     if i == 11:
         matchdict = updateWatchedLeagues(matchdict, getSelectedLeagues())
         alerts = checkAlerts()
+        statsinterval = getStatsInterval()
 
-    # If user wants alerts and we've reached ou desired loop number...
-    if alerts and not i:
-
-        # Update our match dictionary and check for updates.
-        debug("Checking scores...")
-        matchdict = doUpdates(matchdict)
+    # If user wants alerts then update any leagues that are due and check
+    # for updates. Leagues with live matches are due every minute, others
+    # less often (see PollScheduler).
+    if alerts:
+        matchdict = doUpdates(matchdict, scheduler)
         
+    # Write the timings to the log every statsinterval minutes
+    if statsinterval:
+        statscount += 1
+        if statscount >= statsinterval * 12:
+            logStats()
+            statscount = 0
+
     # Sleep for 5 seconds (if this is longer, XBMC may not shut down cleanly.)
     xbmc.sleep(5000)
 
     # Increment our counter
-    # 12 x 5000 = 60,000 i.e. scores update every 1 minute
-    # Currently hard-coded - may look to change this.
+    # 12 x 5000 = 60,000 i.e. check for new leagues every 1 minute
     i = (i + 1) % 12
+
+# Make sure any updates still running have been cancelled before we exit
+abortwatcher.join()
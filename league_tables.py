@@ -39,7 +39,7 @@ import xbmc
 import xbmcgui
 import xbmcaddon
 
-from resources.lib.footballscores import LeagueTable
+from resources.lib.footballscores import LeagueTable, Prefetcher
 
 # Import PyXBMCt module.
 from pyxbmct.addonwindow import *
@@ -47,6 +47,12 @@ from pyxbmct.addonwindow import *
 _A_ = xbmcaddon.Addon("service.bbclivefootballscores")
 _S_ = _A_.getSetting
 
+# Number of league tables to keep in memory
+CACHE_SIZE = 5
+
+# Tables we've kept are checked again after this (seconds)
+TABLE_TTL = 60
+
 def localise(id):
     '''Gets localised string.
 
@@ -80,6 +86,12 @@ class XBMCLeagueTable(object):
         # Create a Leaue Table instance
         self.league = LeagueTable()
 
+        # Tables are fetched in the background when we think the user is
+        # going to want them
+        self.tables = Prefetcher(lambda ID: self.league.getLeagueTable(
+                                                    "competition-%s" % (ID)),
+                                 size=CACHE_SIZE)
+
         self.prog.update(25, localise(32108))
 
         # Get all of the available leagues, store it in an Ordered Dict
@@ -119,6 +131,10 @@ class XBMCLeagueTable(object):
         # Get the appropriate list of leagues depending on what mode we're in
         displaylist = self.allleagues if self.showall else self.watchedleagues
 
+        # Keep hold of the list we're showing so we know which leagues are
+        # next to each other
+        self.menuleagues = displaylist
+
         #self.prog.update(92)
 
         # Add the List to the menu
@@ -241,8 +257,9 @@ class XBMCLeagueTable(object):
 
         self.prog.create(localise(32106), localise(32111))
         try:
-            raw = self.league.getLeagueTable("competition-%s" 
-                                                 % (self.leagueid))
+            # If the table is being downloaded in the background then this
+            # just waits for it to finish
+            raw = self.tables.get(ID, maxage=TABLE_TTL)
 
         except:
             raw = None
@@ -251,6 +268,16 @@ class XBMCLeagueTable(object):
 
         return raw
 
+    def prefetchNeighbours(self):
+        '''Starts downloading the tables either side of the one we're
+        showing so that they're ready if the user picks them next.
+        '''
+        ids = self.menuleagues.values()
+
+        if self.leagueid in ids:
+            i = ids.index(self.leagueid)
+            self.tables.prefetch(ids[max(i - 1, 0):i + 2])
+
     def setID(self, ID, w):
         # Gets the ID of the selected league
         ID = self.allleagues[ID]
@@ -282,6 +309,7 @@ class XBMCLeagueTable(object):
         self.redraw = True
         w.close()
         self.rawleaguedata = self.getLeagueTableData(self.leagueid)
+        self.prefetchNeighbours()
         print self.rawleaguedata
         self.prog.update(90)
 
@@ -29,6 +29,7 @@
 '''
 import sys
 import os
+import threading
 
 if sys.version_info >=  (2, 7):
     import json as json
@@ -40,7 +41,8 @@ import xbmc
 import xbmcgui
 import xbmcaddon
 
-from resources.lib.footballscores import League
+from resources.lib.footballscores import (League, Prefetcher, FetchError,
+                                          saveFile)
 
 # Import PyXBMCt module.
 from pyxbmct.addonwindow import *
@@ -49,6 +51,18 @@ _A_ = xbmcaddon.Addon("service.bbclivefootballscores")
 _S_ = _A_.getSetting
 pluginPath = _A_.getAddonInfo("path")
 
+# Today's competitions are saved here so that the menu can be shown
+# straight away next time
+COMPETITION_CACHE = os.path.join(
+                        xbmc.translatePath(_A_.getAddonInfo("profile")),
+                        "competitions.json")
+
+# Prefetched leagues older than this (seconds) are updated before showing
+LEAGUE_TTL = 60
+
+# Number of other leagues to keep in memory as well as the favourites
+CACHE_SIZE = 5
+
 def imgloc(img):
     return os.path.join(pluginPath, "resources", "media" , img)
 
@@ -68,10 +82,9 @@ class XBMCLiveScoresDetail(object):
 
     def __init__(self):
 
-        # It may take a bit of time to display menus/tables so let's
+        # It may take a bit of time to display tables so let's
         # make sure the user knows what's going on
         self.prog = xbmcgui.DialogProgressBG()
-        self.prog.create(localise(32106), localise(32107))
 
         # variables for league table display
         self.redraw = False
@@ -83,11 +96,38 @@ class XBMCLiveScoresDetail(object):
         self.active = True
 
         # Get our favourite leagues
-        self.watchedleagues = json.loads(str(_S_("watchedleagues")))
+        self.watchedids = json.loads(str(_S_("watchedleagues")))
+
+        # Leagues that we've already downloaded (or are downloading)
+        self.leagues = Prefetcher(League, 
+                                  size=len(self.watchedids) + CACHE_SIZE)
+
+        # Use the competitions we saw last time if we can. They're checked
+        # again in the background.
+        competitions = self.loadCompetitions()
+        refresh = competitions is not None
+
+        # Nothing saved so we need to wait for them this time
+        if not refresh:
+            self.prog.create(localise(32106), localise(32108))
+            competitions = self.getCompetitions()
+            self.prog.close()
 
-        self.prog.update(25, localise(32108))
-        self.activeleagues = League.getLeagues()
-        self.favouriteleagues = [x for x in self.activeleagues if int(x["id"]) in self.watchedleagues]
+        self.setCompetitions(competitions)
+
+        # Get the favourite leagues ready while the user looks at the menu
+        self.leagues.prefetch(self.watchedleagues.values())
+
+        if refresh:
+            t = threading.Thread(target=self.refreshCompetitions)
+            t.daemon = True
+            t.start()
+
+    def setCompetitions(self, competitions):
+
+        self.activeleagues = competitions
+        self.favouriteleagues = [x for x in self.activeleagues 
+                                 if int(x["id"]) in self.watchedids]
 
         # Get all of the available leagues, store it in an Ordered Dict
         # key=League name
@@ -96,14 +136,47 @@ class XBMCLiveScoresDetail(object):
                                        x["id"]) 
                                        for x in self.activeleagues)
 
-        self.prog.update(75, localise(32109))
-
         # Create a similar Ordered Dict for just those leagues that we're
         # currently followin
         self.watchedleagues = OrderedDict((x["name"], x["id"]) 
                                           for x in self.favouriteleagues)
 
-        self.prog.close()
+    def loadCompetitions(self):
+        '''Returns the competitions saved last time, or None if there
+        aren't any.
+        '''
+        try:
+            with open(COMPETITION_CACHE, "r") as cache:
+                return json.load(cache)
+        except (IOError, ValueError):
+            return None
+
+    def getCompetitions(self):
+        '''Gets today's competitions from the BBC and saves them for next
+        time.
+        '''
+        competitions = League.getLeagues()
+
+        if competitions:
+            try:
+                saveFile(COMPETITION_CACHE, json.dumps(competitions))
+            except (IOError, OSError):
+                pass
+
+        return competitions
+
+    def refreshCompetitions(self):
+        '''Checks for any changes to today's competitions. This runs in
+        the background.
+        '''
+        try:
+            competitions = self.getCompetitions()
+        except:
+            competitions = None
+
+        # Menu will be updated the next time it's shown
+        if competitions:
+            self.setCompetitions(competitions)
 
 
     def showMenu(self, all_leagues=False):
@@ -124,6 +197,10 @@ class XBMCLiveScoresDetail(object):
         # Get the appropriate list of leagues depending on what mode we're in
         displaylist = self.allleagues if self.showall else self.watchedleagues
 
+        # The lists may be updated in the background so keep hold of the
+        # one we're showing
+        self.menuleagues = displaylist
+
         #self.prog.update(92)
 
         # Add the List to the menu
@@ -245,8 +322,9 @@ class XBMCLiveScoresDetail(object):
         # Basic variables
         self.redraw = False
 
+        # We've only just got the score so just get the goals and cards
         match.detailed = True
-        match.Update()
+        match.UpdateDetails(maxage=LEAGUE_TTL)
 
         homeincidents = [x for x in match.rawincidents if x[0]=="home"]
         awayincidents = [x for x in match.rawincidents if x[0]=="away"]
@@ -321,8 +399,21 @@ class XBMCLiveScoresDetail(object):
     def getLiveMatches(self, ID):
 
         self.prog.create(localise(32106), localise(32111))
+
+        # If the league is being downloaded in the background then this
+        # just waits for it to finish
         try:
-            raw = League(self.leagueid)
+            raw = self.leagues.get(ID)
+
+            # Make sure we're not showing old scores
+            if self.leagues.age(ID) > LEAGUE_TTL:
+                try:
+                    raw.Update()
+                    self.leagues.put(ID, raw)
+
+                # Show the scores we've got rather than nothing
+                except FetchError:
+                    pass
 
         except:
             raw = None
@@ -331,13 +422,23 @@ class XBMCLiveScoresDetail(object):
 
         return raw
 
+    def prefetchNeighbours(self):
+        '''Starts downloading the leagues either side of the one we're
+        showing so that they're ready if the user picks them next.
+        '''
+        ids = self.menuleagues.values()
+
+        if self.leagueid in ids:
+            i = ids.index(self.leagueid)
+            self.leagues.prefetch(ids[max(i - 1, 0):i + 2])
+
     def back(self, w):
         self.redraw = True
         w.close()
 
     def setID(self, ID, w):
         # Gets the ID of the selected league
-        ID = self.allleagues[ID]
+        ID = self.menuleagues[ID]
         self.setleague(ID,w)
 
     def setMatch(self, ID, w):
@@ -371,6 +472,7 @@ class XBMCLiveScoresDetail(object):
         self.redraw = True
         w.close()
         self.rawdata = self.getLiveMatches(self.leagueid)
+        self.prefetchNeighbours()
         self.prog.update(90)
 
     def toggleMode(self,w):
@@ -13,32 +13,769 @@
     along with this program. If not, see <http://www.gnu.org/licenses/>.
 '''
 
-import urllib2
+import httplib
+import HTMLParser
+import os
+import Queue
+import socket
 import string
+import threading
+import time as _time
+import urlparse
 from BeautifulSoup import BeautifulSoup
 import re
-from datetime import datetime, time
+from collections import namedtuple, OrderedDict
+from datetime import datetime, time, timedelta
 import json
 import codecs
+import hashlib
+
+
+class HTTPResult(object):
+    '''Simple response object returned by HTTPSession.
+
+    Behaves enough like a urllib2 response (i.e. has a read method) that
+    it can be returned by getPage when sendresponse is True.
+
+    notmodified - True if the server said the page hadn't changed (HTTP 304)
+                  in which case body is the copy we downloaded previously.
+    validator   - ETag or Last-Modified value identifying this version of
+                  the page (None if the server didn't send either).
+    digest      - hash of the body so that identical pages can be spotted
+                  even if the server doesn't send validators.
+    '''
+
+    def __init__(self, url, status, headers, body, notmodified=False,
+                 validator=None, digest=None):
+        self.url = url
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.notmodified = notmodified
+        self.validator = validator
+        self.digest = digest or hashlib.md5(body).hexdigest()
+
+    def read(self):
+        return self.body
+
+    def getcode(self):
+        return self.status
+
+    def info(self):
+        return self.headers
+
+    def __repr__(self):
+        return "<HTTPResult %s - %s>" % (self.status, self.url)
+
+
+class RequestCancelled(socket.timeout):
+    '''Raised when a request is abandoned because the session has been
+    cancelled or its deadline has passed.
+    '''
+    pass
+
+
+class FetchError(IOError):
+    '''Raised when a page that we need couldn't be downloaded (e.g. the
+    request timed out or the server returned an error), as opposed to the
+    page being empty.
+    '''
+    pass
+
+
+class HTTPSession(object):
+    '''Pooled HTTP client shared by all of the match classes.
+
+    Connections are kept alive and reused between requests to the same
+    host so that a polling cycle only needs one handshake per host rather
+    than one per page. The number of simultaneous requests to any one host
+    is capped by maxperhost.
+
+    Connecting and each read from the server time out after connecttimeout
+    and readtimeout seconds, so a host that stops responding can't hold
+    up a request for ever. A deadline can also be set for all requests
+    (see setDeadline).
+    '''
+
+    user_agent = ('Mozilla/5.0 (Windows; U; Windows NT 6.1; '
+                  'en-US; rv:1.9.1.5) Gecko/20091102 Firefox')
+
+    maxredirects = 5
+
+    # Most pages, and most bytes of page bodies, to keep validators for.
+    # The least recently requested are forgotten first.
+    maxvalidators = 100
+    maxvalidatorbytes = 2 * 1024 * 1024
+
+    # Timeouts in seconds
+    connecttimeout = 10
+    readtimeout = 15
+
+    def __init__(self, maxperhost=8):
+        self.maxperhost = maxperhost
+        self.__lock = threading.Lock()
+        self.__idle = {}
+        self.__active = set()
+        self.__slots = {}
+        self.__validators = OrderedDict()
+        self.__validatorbytes = 0
+        self.__deadline = None
+        self.__cancelled = False
+        self.resetStats()
+
+    def setDeadline(self, deadline):
+        '''Sets the time (as returned by time.time) by which all requests
+        must have finished. Requests still waiting for the server at the
+        deadline time out, and any made after it raise RequestCancelled.
+
+        A deadline of None removes the deadline.
+        '''
+        self.__deadline = deadline
+
+    def cancel(self):
+        '''Abandons all requests in progress and stops any more being made
+        (they raise RequestCancelled) until the session is closed.
+        '''
+        with self.__lock:
+            self.__cancelled = True
+            active = list(self.__active)
+
+        # Shutting down the sockets wakes up any threads waiting on them
+        for conn in active:
+            try:
+                conn.sock.shutdown(socket.SHUT_RDWR)
+            except (AttributeError, socket.error):
+                pass
+
+        self.close(cancelled=True)
+
+    def __timeout(self, timeout):
+        '''Returns timeout, cut short if the deadline is sooner. Raises
+        RequestCancelled if the session is cancelled or the deadline has
+        passed.
+        '''
+        if self.__cancelled:
+            raise RequestCancelled("Session cancelled")
+
+        deadline = self.__deadline
+        if deadline is not None:
+            remaining = deadline - _time.time()
+            if remaining <= 0:
+                raise RequestCancelled("Deadline passed")
+            timeout = min(timeout, remaining)
+
+        return timeout
+
+    def __getSlot(self, key):
+        '''Returns the semaphore limiting concurrent requests to a host.'''
+        with self.__lock:
+            if key not in self.__slots:
+                self.__slots[key] = threading.BoundedSemaphore(self.maxperhost)
+            return self.__slots[key]
+
+    def __newConnection(self, key):
+        scheme, netloc = key
+        if scheme == "https":
+            conn = httplib.HTTPSConnection(netloc,
+                                           timeout=self.connecttimeout)
+        else:
+            conn = httplib.HTTPConnection(netloc,
+                                          timeout=self.connecttimeout)
+        self.count("opened")
+        return conn
+
+    def __getConnection(self, key):
+        '''Returns a tuple of (connection, reused).'''
+        with self.__lock:
+            idle = self.__idle.get(key)
+            if idle:
+                conn = idle.pop()
+                self.__counters["reused"] += 1
+                return conn, True
+        return self.__newConnection(key), False
+
+    def __setActive(self, conn, active):
+        '''Keeps track of the connections being used so that cancel can
+        close them.
+        '''
+        with self.__lock:
+            if active:
+                self.__active.add(conn)
+            else:
+                self.__active.discard(conn)
+
+    def __releaseConnection(self, key, conn):
+        with self.__lock:
+            self.__idle.setdefault(key, []).append(conn)
+
+    def __send(self, conn, path, headers):
+
+        if conn.sock is None:
+            conn.timeout = self.__timeout(self.connecttimeout)
+            conn.connect()
+
+        conn.sock.settimeout(self.__timeout(self.readtimeout))
+
+        conn.request("GET", path, headers=headers)
+        response = conn.getresponse()
+        body = response.read()
+        return response, body
+
+    def get(self, url, headers=None):
+        '''Requests url and returns an HTTPResult object.
+
+        Redirects are followed. Raises socket.error or
+        httplib.HTTPException if the request could not be completed, or
+        RequestCancelled if it was given up because the session was
+        cancelled or the deadline passed.
+        '''
+        for _ in range(self.maxredirects + 1):
+            try:
+                result = self.__get(url, headers)
+
+            except (httplib.HTTPException, socket.error):
+                # If the request failed because we gave up on it then
+                # raise RequestCancelled instead
+                self.__timeout(0)
+                raise
+
+            location = result.headers.get("location")
+            if result.status in (301, 302, 303, 307) and location:
+                url = urlparse.urljoin(url, location)
+            else:
+                return result
+
+        raise httplib.HTTPException("Too many redirects: %s" % (url))
+
+    def __get(self, url, headers=None):
+
+        parts = urlparse.urlsplit(url)
+        key = (parts.scheme, parts.netloc)
+        path = urlparse.urlunsplit(("", "", parts.path or "/",
+                                    parts.query, ""))
+
+        reqheaders = {"User-Agent": self.user_agent,
+                      "Connection": "keep-alive"}
+        if headers:
+            reqheaders.update(headers)
+
+        # If we've seen this page before, ask the server to tell us if it
+        # hasn't changed rather than sending it all again
+        with self.__lock:
+            previous = self.__validators.pop(url, None)
+
+            # Keep track of which pages were requested most recently
+            if previous:
+                self.__validators[url] = previous
+
+        if previous:
+            etag, lastmodified, _ = previous
+            if etag:
+                reqheaders["If-None-Match"] = etag
+            if lastmodified:
+                reqheaders["If-Modified-Since"] = lastmodified
+
+        slot = self.__getSlot(key)
+        slot.acquire()
+
+        conn = None
+
+        try:
+            conn, reused = self.__getConnection(key)
+            self.__setActive(conn, True)
+
+            try:
+                response, body = self.__send(conn, path, reqheaders)
+
+            # No point trying again if the server is just slow
+            except socket.timeout:
+                conn.close()
+                raise
+
+            except (httplib.HTTPException, socket.error):
+                conn.close()
+
+                # The server may have dropped an idle connection since we
+                # last used it so try again once with a fresh one.
+                if not reused:
+                    raise
+
+                self.__setActive(conn, False)
+                conn = self.__newConnection(key)
+                self.__setActive(conn, True)
+
+                try:
+                    response, body = self.__send(conn, path, reqheaders)
+
+                # Don't leave the new connection open
+                except Exception:
+                    conn.close()
+                    raise
+
+            self.__setActive(conn, False)
+
+            if response.will_close or self.__cancelled:
+                conn.close()
+            else:
+                self.__releaseConnection(key, conn)
+
+        finally:
+            if conn is not None:
+                self.__setActive(conn, False)
+            slot.release()
+
+        self.count("requests")
+        self.count("bytesread", len(body))
+
+        resheaders = dict(response.getheaders())
+
+        if response.status == 304 and previous:
+            self.count("notmodified")
+            etag, lastmodified, result = previous
+            return HTTPResult(url,
+                              response.status,
+                              resheaders,
+                              result.body,
+                              notmodified=True,
+                              validator=etag or lastmodified,
+                              digest=result.digest)
+
+        etag = resheaders.get("etag")
+        lastmodified = resheaders.get("last-modified")
+
+        result = HTTPResult(url,
+                            response.status,
+                            resheaders,
+                            body,
+                            validator=etag or lastmodified)
+
+        if response.status == 200 and (etag or lastmodified):
+            with self.__lock:
+                self.__forgetValidator(url)
+                self.__validators[url] = (etag, lastmodified, result)
+                self.__validatorbytes += len(body)
+
+                while (len(self.__validators) > self.maxvalidators or
+                       self.__validatorbytes > self.maxvalidatorbytes):
+                    self.__forgetValidator(next(iter(self.__validators)))
+
+        return result
+
+    def __forgetValidator(self, url):
+        '''Removes the validators for url. Must be called with the lock
+        held.
+        '''
+        previous = self.__validators.pop(url, None)
+        if previous:
+            self.__validatorbytes -= len(previous[2].body)
+
+    def count(self, counter, n=1):
+        '''Increments one of the session counters.'''
+        with self.__lock:
+            self.__counters[counter] = self.__counters.get(counter, 0) + n
+
+    def stats(self):
+        '''Returns a dict of the session counters.
+
+        opened:     number of connections opened
+        reused:     number of requests sent over an existing connection
+        requests:   number of completed requests
+        bytesread:  number of bytes received
+        notmodified:number of requests answered with "304 Not Modified"
+        unchanged:  number of times a page was identical to the version
+                    processed last time, so didn't need parsing again
+        '''
+        with self.__lock:
+            return dict(self.__counters)
+
+    def resetStats(self):
+        with self.__lock:
+            self.__counters = {"opened": 0,
+                               "reused": 0,
+                               "requests": 0,
+                               "bytesread": 0,
+                               "notmodified": 0,
+                               "unchanged": 0}
+
+    def close(self, cancelled=False):
+        '''Closes all idle connections and forgets stored validators.
+
+        The session can be used again afterwards unless cancelled is True.
+        '''
+        with self.__lock:
+            idle, self.__idle = self.__idle, {}
+            self.__validators = OrderedDict()
+            self.__validatorbytes = 0
+            self.__cancelled = cancelled
+
+        for conns in idle.values():
+            for conn in conns:
+                conn.close()
+
+
+class PageCache(object):
+    '''Short lived cache of downloaded pages, keyed by url.
+
+    Lets the match classes share a page that is needed more than once
+    during a single polling cycle (e.g. League needs the same page for its
+    matches and its name). The ttl should be no longer than the polling
+    interval so that each cycle sees fresh data.
+    '''
+
+    def __init__(self, ttl=55):
+        self.ttl = ttl
+        self.__lock = threading.Lock()
+        self.__pages = {}
+
+    def get(self, url):
+        '''Returns the cached HTTPResult for url or None if there isn't
+        one or it has expired.
+        '''
+        with self.__lock:
+            cached = self.__pages.get(url)
+
+            if cached is None:
+                return None
+
+            expires, result = cached
+
+            if expires < _time.time():
+                del self.__pages[url]
+                return None
+
+            return result
+
+    def set(self, url, result):
+        with self.__lock:
+            self.__pages[url] = (_time.time() + self.ttl, result)
+
+    def invalidate(self, url=None):
+        '''Removes url from the cache. If no url is given, the whole cache
+        is cleared.
+        '''
+        with self.__lock:
+            if url is None:
+                self.__pages.clear()
+            else:
+                self.__pages.pop(url, None)
+
+
+class PhaseTimer(object):
+    '''Context manager which adds the time spent in its block to a phase
+    of a Timings object.
+    '''
+
+    __slots__ = ("timings", "phase", "key", "nbytes", "start")
+
+    def __init__(self, timings, phase, key=None):
+        self.timings = timings
+        self.phase = phase
+        self.key = key
+        self.nbytes = 0
+        self.start = None
+
+    def __enter__(self):
+        self.start = _time.time()
+        return self
+
+    def __exit__(self, *exc):
+        self.timings.add(self.phase, _time.time() - self.start, self.key,
+                         self.nbytes)
+
+
+class Timings(object):
+    '''Records where the time goes when updating matches.
+
+    Time is added up by phase (e.g. "fetch", "parse", "diff", "notify",
+    "league", "cycle"). A phase can also be split by key (e.g. the url of
+    a fetch or the id of a league). Recording is just a lock and a couple of
+    additions so it's cheap enough to leave on all the time.
+    '''
+
+    # Most keys kept for each phase. Anything beyond this is added to
+    # "other" so the stats can't grow without limit.
+    maxkeys = 200
+
+    def __init__(self):
+        self.enabled = True
+        self.__lock = threading.Lock()
+        self.resetStats()
+
+    def timer(self, phase, key=None):
+        '''Returns a context manager which times its block. Set nbytes on
+        it to record the size of what was processed.
+
+          with timings.timer("fetch", url) as t:
+              t.nbytes = len(download(url))
+        '''
+        return PhaseTimer(self, phase, key)
+
+    def add(self, phase, seconds, key=None, nbytes=0):
+        '''Adds seconds (and optionally nbytes) to phase.'''
+        if not self.enabled:
+            return
+
+        with self.__lock:
+            entries = [self.__phases.setdefault(phase, [0, 0.0, 0.0, 0])]
+
+            if key is not None:
+                keys = self.__keys.setdefault(phase, {})
+                if key not in keys and len(keys) >= self.maxkeys:
+                    key = "other"
+                entries.append(keys.setdefault(key, [0, 0.0, 0.0, 0]))
+
+            for entry in entries:
+                entry[0] += 1
+                entry[1] += seconds
+                entry[2] = max(entry[2], seconds)
+                entry[3] += nbytes
+
+    @staticmethod
+    def __entry(entry):
+        count, total, longest, nbytes = entry
+        return {"count": count, "total": total, "max": longest,
+                "bytes": nbytes}
+
+    def stats(self):
+        '''Returns a dict of the timings since the last reset.
+
+        period:     seconds since the last reset
+        phases:     {phase: entry}
+        keys:       {phase: {key: entry}}
+
+        Each entry is a dict of count, total (seconds), max (seconds) and
+        bytes.
+        '''
+        with self.__lock:
+            return {"period": _time.time() - self.__since,
+                    "phases": dict((p, self.__entry(e))
+                                   for p, e in self.__phases.items()),
+                    "keys": dict((p, dict((k, self.__entry(e))
+                                          for k, e in keys.items()))
+                                 for p, keys in self.__keys.items())}
+
+    def summary(self, top=5):
+        '''Returns a list of lines describing the stats, with the top
+        slowest keys of each phase.
+        '''
+        stats = self.stats()
+        lines = ["Timings for last {0:.0f}s".format(stats["period"])]
+
+        for phase, e in sorted(stats["phases"].items()):
+            line = "{0}: {1} in {2:.3f}s (max {3:.3f}s)".format(
+                        phase, e["count"], e["total"], e["max"])
+            if e["bytes"]:
+                line += ", {0} bytes".format(e["bytes"])
+            lines.append(line)
+
+            keys = stats["keys"].get(phase, {})
+            for key, k in sorted(keys.items(),
+                                 key=lambda item: -item[1]["total"])[:top]:
+                lines.append("  {0}: {1} in {2:.3f}s".format(
+                                key, k["count"], k["total"]))
+
+        return lines
+
+    def resetStats(self):
+        with self.__lock:
+            self.__since = _time.time()
+            self.__phases = {}
+            self.__keys = {}
+
+# Module level session, page cache and timings shared by all instances of
+# the match classes
+session = HTTPSession()
+pagecache = PageCache()
+timings = Timings()
+
+
+def runConcurrently(func, items, workers=4, stop=None):
+    '''Calls func for each item in items using a bounded pool of worker
+    threads.
+
+    Returns a list of results in the same order as items. If a call raises
+    an exception then the exception is returned in place of its result.
+
+    stop - optional threading.Event. Once it is set, no further items are
+    started and the result for any item not started is None.
+    '''
+    items = list(items)
+    results = [None] * len(items)
+    queue = Queue.Queue()
+
+    for i, item in enumerate(items):
+        queue.put((i, item))
+
+    def worker():
+        while not (stop and stop.is_set()):
+            try:
+                i, item = queue.get_nowait()
+            except Queue.Empty:
+                break
+
+            try:
+                results[i] = func(item)
+            except Exception, e:
+                results[i] = e
+
+    threads = [threading.Thread(target=worker) 
+               for _ in range(max(1, min(workers, len(items))))]
+
+    for t in threads:
+        t.daemon = True
+        t.start()
+
+    for t in threads:
+        t.join()
+
+    return results
+
+
+class Prefetcher(object):
+    '''Fetches items (e.g. leagues) in the background so that they're
+    ready by the time they're needed.
+
+    Only the most recently used items are kept.
+    '''
+
+    def __init__(self, fetch, size=5, workers=2):
+        '''fetch - function taking a key and returning its item
+        size - maximum number of items to keep
+        workers - number of items to fetch at the same time
+        '''
+        self.fetch = fetch
+        self.size = size
+        self.workers = workers
+
+        # key=key
+        # value=(time fetched, item)
+        self.__items = OrderedDict()
+
+        # key=key
+        # value=threading.Event set when the fetch finishes
+        self.__pending = {}
+
+        self.__lock = threading.Lock()
+
+    def __contains__(self, key):
+        with self.__lock:
+            return key in self.__items
+
+    def prefetch(self, keys):
+        '''Starts fetching any of keys that we don't already have in a
+        background thread.
+        '''
+        with self.__lock:
+            keys = [k for k in keys 
+                    if not (k in self.__items or k in self.__pending)]
+
+            for k in keys:
+                self.__pending[k] = threading.Event()
+
+        if keys:
+            t = threading.Thread(target=runConcurrently,
+                                 args=(self.__fetch, keys),
+                                 kwargs={"workers": self.workers})
+            t.daemon = True
+            t.start()
+
+    def __fetch(self, key):
+
+        try:
+            item = self.fetch(key)
+            self.put(key, item)
+            return item
+
+        finally:
+            with self.__lock:
+                done = self.__pending.pop(key, None)
+
+            if done:
+                done.set()
+
+    def put(self, key, item):
+        '''Stores item, replacing the least recently used item if we've
+        got too many.
+        '''
+        with self.__lock:
+            self.__items.pop(key, None)
+            self.__items[key] = (UKClock.clock(), item)
+
+            while len(self.__items) > self.size:
+                self.__items.popitem(last=False)
+
+    def age(self, key):
+        '''Number of seconds since key was fetched (None if we don't have
+        it).
+        '''
+        with self.__lock:
+            fetched, _ = self.__items.get(key, (None, None))
+
+        if fetched is None:
+            return None
+
+        return UKClock.clock() - fetched
+
+    def get(self, key, maxage=None):
+        '''Returns the item for key.
+
+        If it's being fetched in the background then we wait for it. If we
+        don't have it, or it's older than maxage seconds, it is fetched now.
+        '''
+        with self.__lock:
+            pending = self.__pending.get(key)
+
+        if pending:
+            pending.wait()
+
+        with self.__lock:
+            fetched, item = self.__items.pop(key, (None, None))
+
+            # Keep track of which item was used most recently
+            if fetched is not None:
+                self.__items[key] = (fetched, item)
+
+        if (fetched is None or 
+            (maxage is not None and UKClock.clock() - fetched > maxage)):
+            return self.__fetch(key)
+
+        return item
 
 
 class matchcommon(object):
     '''class for common functions for match classes.'''
 
+    # Relative links on the BBC pages are relative to this
+    siteroot = "http://www.bbc.co.uk"
+
     livescoreslink = ("http://www.bbc.co.uk/sport/shared/football/"
                       "live-scores/matches/{comp}/today")
 
+    # Number of pages to fetch at the same time when we need to look
+    # through every competition
+    workers = 4
+
     def getPage(self, url, sendresponse = False):
         page = None
-        try:
-            user_agent = ('Mozilla/5.0 (Windows; U; Windows NT 6.1; '
-                          'en-US; rv:1.9.1.5) Gecko/20091102 Firefox')
-            headers = { 'User-Agent' : user_agent }
-            request = urllib2.Request(url)
-            response = urllib2.urlopen(request)
+        response = pagecache.get(url)
+
+        if response is None:
+            try:
+                with timings.timer("fetch", url) as t:
+                    response = session.get(url)
+                    if not response.notmodified:
+                        t.nbytes = len(response.body)
+                # Pages that don't exist are a proper answer too, so only
+                # server errors are tried again
+                if response.status < 500:
+                    pagecache.set(url, response)
+            except RequestCancelled:
+                raise
+            except:
+                pass
+
+        if response is not None and response.status < 400:
             page = response.read()
-        except:
-            pass
         
         if sendresponse:
             return response    
@@ -46,6 +783,583 @@ class matchcommon(object):
             # Fixed this line to handle accented team namess
             return codecs.decode(page, "utf-8") if page else None
 
+    def getLiveScores(self, league=""):
+        '''Downloads and parses the live scores page for league (or for
+        all competitions if no league is given).
+
+        Returns a LiveScoresParser or None if the page couldn't be loaded.
+        '''
+        page = self.getPage(self.livescoreslink.format(comp=league))
+
+        if not page:
+            return None
+
+        with timings.timer("parse") as t:
+            t.nbytes = len(page)
+            return LiveScoresParser(page)
+
+    def checkPage(self, url, digest):
+        '''Fetches url and works out whether it has changed since the
+        version identified by digest was processed.
+
+        Pages are compared by their content hash so this works whether the
+        server answered "304 Not Modified" or just sent the same page again.
+
+        Returns a tuple of (changed, digest). changed is always True if
+        the page couldn't be fetched.
+
+        The page is left in the page cache so it can be read with getPage
+        without downloading it again.
+        '''
+        response = self.getPage(url, sendresponse=True)
+
+        if response is None or response.status >= 400:
+            return True, None
+
+        if response.digest == digest:
+            session.count("unchanged")
+            return False, digest
+
+        return True, response.digest
+
+    def fetchPages(self, urls):
+        '''Downloads urls at the same time and leaves them in the page
+        cache, so they can be read afterwards without waiting for the
+        network.
+
+        Raises RequestCancelled if any of the requests was given up, or
+        FetchError if any of the pages couldn't be downloaded. A page that
+        doesn't exist (e.g. 404) isn't an error.
+        '''
+
+        def fetch(url):
+            response = self.getPage(url, sendresponse=True)
+            if response is None or response.status >= 500:
+                raise FetchError("Unable to download %s" % (url))
+
+        errors = [e for e in runConcurrently(fetch, urls, workers=self.workers)
+                  if isinstance(e, Exception)]
+
+        for e in errors:
+            if isinstance(e, RequestCancelled):
+                raise e
+
+        if errors:
+            raise errors[0]
+
+class MatchState(namedtuple("MatchState", ["matchid",
+                                           "hometeam",
+                                           "awayteam",
+                                           "homescore",
+                                           "awayscore",
+                                           "status",
+                                           "matchtime",
+                                           "matchlink"])):
+    '''Immutable snapshot of the score state of a match.
+
+    Uses __slots__ so it's much smaller than a dict or an instance with its
+    own attribute dict. As it can't be changed, one snapshot can be shared
+    by a MatchIndex and the FootballMatch following that match.
+    '''
+    __slots__ = ()
+
+# State of a match that hasn't been found
+EMPTY_STATE = MatchState(*([None] * len(MatchState._fields)))
+
+
+class MatchIndex(object):
+    '''Index of the match rows on a live scores page.
+
+    The matches-wrapper section of the page is walked once and each match
+    row is converted into a MatchState. Rows can then be looked up by match id or
+    by team name without searching the page again, so the index can be
+    shared by a League and all of its FootballMatch objects.
+    '''
+
+    def __init__(self, data=None):
+        '''data - the matches-wrapper section of the live scores page. If
+        this isn't given then rows can be added with addRow.
+        '''
+        self.rows = []
+        self.__byid = {}
+        self.__byteam = {}
+
+        if data is not None:
+            for match in data.findAll("tr", 
+                                      {"id": re.compile(r'^match-row')}):
+                self.addRow(self.parseRow(match))
+
+    @staticmethod
+    def parseRow(match):
+        '''Converts a match-row into a MatchState.'''
+
+        linkrow = match.find("td", {"class": "match-link"})
+        try:
+            link = linkrow.find("a").get("href")
+        except AttributeError:
+            link = None
+
+        elapsed = match.find("span", {"class": "elapsed-time"})
+
+        return MatchIndex.makeRow(
+                 match.get("id"),
+                 match.get("class"),
+                 match.find("span", {"class": "team-home"}).text, ## ENCODE
+                 match.find("span", {"class": "team-away"}).text,
+                 match.find("span", {"class": "score"}).text,
+                 elapsed.text if elapsed else None,
+                 link)
+
+    @staticmethod
+    def makeRow(rowid, rowclass, hometeam, awayteam, score, elapsed, link):
+        '''Builds the MatchState for a match row from the text of its
+        cells.
+
+        Used by parseRow and LiveScoresParser so both give the same result.
+        '''
+        matchlink = matchcommon.siteroot + link if link else None
+
+        elapsed = elapsed.strip() if elapsed else u""
+
+        if rowclass == "fixture":
+            status = "Fixture"
+            matchtime = elapsed[:5]
+
+        elif rowclass == "report":
+            status = "FT"
+            matchtime = None
+
+        elif elapsed == "Half Time":
+            status = "HT"
+            matchtime = None
+
+        else:
+            status = "L"
+            matchtime = elapsed
+
+        score = score.strip().split(" - ")
+        
+        try:
+            homescore = int(score[0].strip())
+            awayscore = int(score[1].strip())
+        
+        except:
+            homescore = 0
+            awayscore = 0
+
+        return MatchState(matchid=rowid[10:] or None, ## ENCODE
+                          hometeam=hometeam,
+                          awayteam=awayteam,
+                          homescore=homescore,
+                          awayscore=awayscore,
+                          status=status or None,
+                          matchtime=matchtime or None,
+                          matchlink=matchlink)
+
+    def addRow(self, row):
+        self.rows.append(row)
+        self.__byid[row.matchid] = row
+        self.__byteam[row.hometeam] = row
+        self.__byteam[row.awayteam] = row
+
+    def find(self, team):
+        '''Returns the MatchState for the match involving team (or None).'''
+        return self.__byteam.get(team)
+
+    def get(self, matchid):
+        '''Returns the MatchState for the given match id (or None).'''
+        return self.__byid.get(matchid)
+
+    def __contains__(self, matchid):
+        return matchid in self.__byid
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def __repr__(self):
+        return "<MatchIndex - %d matches>" % (len(self.rows))
+
+
+class LiveScoresParser(HTMLParser.HTMLParser):
+    '''Streaming parser for the BBC live scores page.
+
+    Building a BeautifulSoup tree of the whole page just to read the match
+    table is slow so this just picks out the bits we need as the page is
+    read:
+
+    matches:        MatchIndex of the rows in the matches-wrapper section
+    competitions:   list of the competitions in the drop down filter, in 
+                    the format {"name": xx, "id": xx, "selected": bool}
+
+    Text is treated in the same way as BeautifulSoup (entities are left
+    alone and each piece of text is stripped) so the rows are identical to
+    those built by MatchIndex.parseRow.
+    '''
+
+    # Cells we want from each match row: (tag, class) -> field name
+    rowcells = {("span", "team-home"): "hometeam",
+                ("span", "team-away"): "awayteam",
+                ("span", "score"): "score",
+                ("span", "elapsed-time"): "elapsed",
+                ("td", "match-link"): "linkcell"}
+
+    def __init__(self, page=None):
+        HTMLParser.HTMLParser.__init__(self)
+        self.matches = MatchIndex()
+        self.competitions = []
+
+        # Sections of the page we're currently in: name -> [tag, depth]
+        self.__sections = {}
+
+        # Fields of the current row being captured: name -> [tag, depth]
+        self.__capturing = {}
+        self.__text = {}
+        self.__row = None
+        self.__option = None
+
+        # Text read since the last tag
+        self.__data = []
+
+        if page:
+            self.feed(page)
+            self.close()
+
+    def __enter(self, tags, tag):
+        '''Increases depth of any open section with the same tag.'''
+        for section in tags.values():
+            if section[0] == tag:
+                section[1] += 1
+
+    def __leave(self, tags, tag):
+        '''Decreases depth of open sections and returns list of those
+        that have now closed.'''
+        closed = []
+        for name, section in tags.items():
+            if section[0] == tag:
+                section[1] -= 1
+                if not section[1]:
+                    del tags[name]
+                    closed.append(name)
+        return closed
+
+    def __flush(self):
+        '''Adds the text read since the last tag to the fields being
+        captured. Like BeautifulSoup, each piece of text is stripped.
+        '''
+        if not self.__data:
+            return
+
+        data = u"".join(self.__data).strip()
+        self.__data = []
+
+        for field in self.__capturing:
+            self.__text[field].append(data)
+
+        if self.__option is not None:
+            self.__option["text"].append(data)
+
+    def handle_starttag(self, tag, attrs):
+        self.__flush()
+        attrs = dict(attrs)
+        sections = self.__sections
+
+        self.__enter(sections, tag)
+        self.__enter(self.__capturing, tag)
+
+        if tag == "div":
+            if attrs.get("id") == "matches-wrapper":
+                sections["matches"] = ["div", 1]
+            elif (attrs.get("class") == 
+                  "drop-down-filter live-scores-fixtures"):
+                sections["filter"] = ["div", 1]
+
+        elif tag == "tr" and "matches" in sections:
+            if (attrs.get("id") or "").startswith("match-row"):
+
+                # Rows don't always get closed
+                self.__endRow()
+                self.__row = {"rowid": attrs.get("id"), 
+                              "rowclass": attrs.get("class"),
+                              "link": None}
+                sections["row"] = ["tr", 1]
+
+        elif tag == "option" and "filter" in sections:
+            self.__endOption()
+            self.__option = {"value": attrs.get("value") or "",
+                             "selected": "selected" in attrs,
+                             "text": []}
+            
+        if "row" in sections:
+            field = self.rowcells.get((tag, attrs.get("class")))
+            if field and field not in self.__text:
+                self.__capturing[field] = [tag, 1]
+                self.__text[field] = []
+
+            if (tag == "a" and "linkcell" in self.__capturing and 
+                    self.__row["link"] is None):
+                self.__row["link"] = attrs.get("href")
+
+    def handle_endtag(self, tag):
+        self.__flush()
+        self.__leave(self.__capturing, tag)
+        closed = self.__leave(self.__sections, tag)
+
+        if tag == "option" or "filter" in closed:
+            self.__endOption()
+
+        if "row" in closed or "matches" in closed:
+            self.__endRow()
+
+    def handle_data(self, data):
+        self.__data.append(data)
+
+    def handle_entityref(self, name):
+        self.handle_data("&%s;" % name)
+
+    def handle_charref(self, name):
+        self.handle_data("&#%s;" % name)
+
+    def handle_comment(self, data):
+        self.__flush()
+        self.handle_data(data)
+        self.__flush()
+
+    def __endOption(self):
+        option = self.__option
+        self.__option = None
+
+        if option:
+            self.competitions.append(
+                        {"name": u"".join(option["text"]).split("(")[0].strip(),
+                         "id": option["value"][12:],
+                         "selected": option["selected"]})
+
+    def __endRow(self):
+        row = self.__row
+        text = self.__text
+
+        self.__row = None
+        self.__text = {}
+        self.__capturing = {}
+        self.__sections.pop("row", None)
+
+        if row:
+            get = lambda field: (u"".join(text[field]) 
+                                 if field in text else None)
+            self.matches.addRow(MatchIndex.makeRow(row["rowid"],
+                                                   row["rowclass"],
+                                                   get("hometeam"),
+                                                   get("awayteam"),
+                                                   get("score") or u"",
+                                                   get("elapsed"),
+                                                   row["link"]))
+
+    def close(self):
+        HTMLParser.HTMLParser.close(self)
+        self.__flush()
+        self.__endOption()
+        self.__endRow()
+
+
+class UKClock(matchcommon):
+    '''Provides the current time in the UK.
+
+    Match times on the BBC site are UK times. Rather than asking geonames
+    for the time whenever we need it, we ask once and keep the offset from
+    the local clock, refreshing it every few hours. If geonames can't be
+    reached, UK time is worked out from the system's UTC clock.
+    '''
+
+    timeurl = ("http://api.geonames.org/timezoneJSON"
+               "?formatted=true&lat=51.51&lng=0.13&"
+               "username=elParaguayo&style=full")
+
+    # How often (in seconds) to check the time with geonames and how long
+    # to wait before trying again if it couldn't be reached
+    refresh = 6 * 60 * 60
+    retry = 10 * 60
+
+    # Without a monotonic clock the local clock can be stepped (e.g. by NTP
+    # on a device without a real time clock). If it goes backwards, or
+    # jumps forward by more than this many seconds between calls to now,
+    # the offset can't be trusted so it's checked again.
+    maxstep = 10 * 60
+
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.__base = None
+        self.__nextsync = 0
+        self.__lastclock = None
+
+    @staticmethod
+    def clock():
+        '''Returns seconds from the local monotonic clock (if available).'''
+        return getattr(_time, "monotonic", _time.time)()
+
+    def __sync(self):
+        '''Gets the current UK time from geonames.'''
+        try:
+            rawbbctime = self.getPage(self.timeurl)
+            bbctime = json.loads(rawbbctime).get("time") if rawbbctime else None
+            servertime = datetime.strptime(bbctime, "%Y-%m-%d %H:%M")
+        except (ValueError, TypeError):
+            servertime = None
+
+        if servertime:
+            self.__base = (servertime, self.clock())
+            self.__nextsync = self.clock() + self.refresh
+        else:
+            self.__nextsync = self.clock() + self.retry
+
+    def now(self):
+        '''Returns a datetime object for the current time in the UK.'''
+        with self.__lock:
+            clock = self.clock()
+            last, self.__lastclock = self.__lastclock, clock
+
+            if last is not None and not 0 <= clock - last <= self.maxstep:
+                self.__base = None
+                self.__nextsync = 0
+
+            if clock >= self.__nextsync:
+                self.__sync()
+
+            base = self.__base
+
+        if base:
+            servertime, synctime = base
+            return servertime + timedelta(seconds=self.clock() - synctime)
+
+        else:
+            return self.localUKTime()
+
+    def reset(self):
+        '''Forces the time to be checked again on the next call to now.'''
+        with self.__lock:
+            self.__base = None
+            self.__nextsync = 0
+            self.__lastclock = None
+
+    @staticmethod
+    def localUKTime():
+        '''Works out the UK time from the system's UTC clock.
+
+        The UK is on GMT except between 01:00 UTC on the last Sundays of
+        March and October when it's on BST (GMT+1).
+        '''
+        now = datetime.utcnow()
+
+        def lastSunday(month):
+            d = datetime(now.year, month, 31, 1, 0)
+            return d - timedelta(days=(d.weekday() + 1) % 7)
+
+        if lastSunday(3) <= now < lastSunday(10):
+            now += timedelta(hours=1)
+
+        return now
+
+# Module level clock so the offset is shared by all matches
+ukclock = UKClock()
+
+
+class IncidentStore(object):
+    '''Holds the incidents (goals and cards) for a match.
+
+    Incidents are tuples in the format:
+      (team, incident type, player, time)
+    where team is "home" or "away" and incident type is "goal", "yellow"
+    or "red".
+
+    rawincidents:   every incident seen, in the order first seen
+    new:            incidents first seen in the latest update
+    '''
+
+    def __init__(self):
+        self.rawincidents = []
+        self.new = []
+        self.__seen = set()
+        self.__players = {}
+        self.__last = {}
+
+    @staticmethod
+    def minute(incidenttime):
+        '''Returns a sort key for an incident time e.g. "45+2'" -> (45, 2)
+        '''
+        return tuple(int(x) for x in re.findall(r"\d+", incidenttime))
+
+    def update(self, incidents):
+        '''Updates the store with the list of incidents currently shown
+        for the match.
+        '''
+        self.new = []
+        players = {}
+        last = {}
+
+        for order, incident in enumerate(incidents):
+            team, incidenttype, player, incidenttime = incident
+
+            if incident not in self.__seen:
+                self.__seen.add(incident)
+                self.rawincidents.append(incident)
+                self.new.append(incident)
+
+            # Group incidents by player
+            group = players.setdefault((team, incidenttype), OrderedDict())
+            group.setdefault(player, []).append(incidenttime)
+
+            # Keep track of the latest incident of each type
+            key = (self.minute(incidenttime), order)
+            if incidenttype not in last or key >= last[incidenttype][0]:
+                last[incidenttype] = (key, incident)
+
+        self.__players = players
+        self.__last = last
+
+    def clearNew(self):
+        self.new = []
+
+    def players(self, team, incidenttype):
+        '''Returns the current incidents of incidenttype for team in the
+        format [(Player Name, [times of incidents])]
+        '''
+        group = self.__players.get((team, incidenttype))
+        return group.items() if group else []
+
+    def last(self, incidenttype):
+        '''Returns the latest current incident of incidenttype (or None).'''
+        last = self.__last.get(incidenttype)
+        return last[1] if last else None
+
+    def byMinute(self):
+        '''Returns all incidents seen, ordered by the time they happened.'''
+        return sorted(self.rawincidents, key=lambda i: self.minute(i[3]))
+
+
+# Types of change reported by FootballMatch.Update and League.Update
+EVENT_GOAL = "goal"
+EVENT_STATUS = "status"
+EVENT_NEWMATCH = "newmatch"
+EVENT_BOOKING = "booking"
+EVENT_REDCARD = "redcard"
+EVENT_REMOVED = "removed"
+
+
+class MatchEvent(namedtuple("MatchEvent", ["event", "match", "incidents"])):
+    '''A change to a match found by an update.
+
+    event:      one of the EVENT_ constants
+    match:      the FootballMatch object that changed
+    incidents:  for detailed matches, the new incidents behind a goal,
+                booking or red card event (otherwise an empty list)
+    '''
+    __slots__ = ()
+
+
+def stateProperty(field):
+    '''Returns a read-only property for a field of FootballMatch.state.'''
+    return property(lambda self: getattr(self.state, field))
+
+
 class FootballMatch(matchcommon):
     '''Class for getting details of individual football matches.
     Data is pulled from BBC live scores page.
@@ -55,13 +1369,29 @@ class FootballMatch(matchcommon):
     detailprefix =   ("http://www.bbc.co.uk/sport/football/live/"
                       "partial/{id}")
 
+    # How long (in seconds) the incidents of a live match are reused
+    # before they're fetched again
+    detailttl = 120
+
+    # The score state lives in an immutable MatchState snapshot which is
+    # replaced on each update. These give access to its fields.
+    matchid = stateProperty("matchid")
+    hometeam = stateProperty("hometeam")
+    awayteam = stateProperty("awayteam")
+    homescore = stateProperty("homescore")
+    awayscore = stateProperty("awayscore")
+    status = stateProperty("status")
+    matchtime = stateProperty("matchtime")
+    matchlink = stateProperty("matchlink")
+
     def __init__(self, team, detailed = False, data = None):
         '''Creates an instance of the Match object.
         Must be created by passing the name of one team.
         
         data - User can also send data to the class e.g. if multiple instances
         of class are being run thereby saving http requests. Otherwise class 
-        can handle request on its own.
+        can handle request on its own. Can be the matches-wrapper section of
+        the live scores page or a MatchIndex built from it.
         
         detailed - Do we want additional data (e.g. goal scorers, bookings)?
         '''
@@ -77,6 +1407,16 @@ class FootballMatch(matchcommon):
         # Which team am I following?
         self.myteam = team
 
+        # Identifies the version of scorelink that we last processed
+        self.__digest = None
+
+        # When we last checked the score
+        self.__scoretime = None
+
+        # When we last fetched the incidents and the version we processed
+        self.__detailtime = None
+        self.__detaildigest = None
+
         self.__resetMatch()
         
         # Let's try and load some data
@@ -93,28 +1433,11 @@ class FootballMatch(matchcommon):
             self.newmatch = False
 
     def __getUKTime(self):
-        #api.geonames.org/timezoneJSON?formatted=true&lat=51.51&lng=0.13&username=demo&style=full
-        rawbbctime = self.getPage("http://api.geonames.org/timezoneJSON"
-                               "?formatted=true&lat=51.51&lng=0.13&"
-                               "username=elParaguayo&style=full")
-        
-        bbctime = json.loads(rawbbctime).get("time") if rawbbctime else None
-
-        if bbctime:
-            servertime = datetime.strptime(bbctime,
-                                           "%Y-%m-%d %H:%M")
-            return servertime
-
-        else:
-
-            return None
+        return ukclock.now()
 
     def __resetMatch(self):
         '''Clear all variables'''
-        self.hometeam = None
-        self.awayteam = None
-        self.homescore = None
-        self.awayscore = None  
+        self.state = EMPTY_STATE
         self.scorelink = None
         self.homescorers = None
         self.awayscorers = None
@@ -123,62 +1446,59 @@ class FootballMatch(matchcommon):
         self.homeredcards = []
         self.awayredcards = []
         self.competition = None
-        self.matchtime = None
-        self.status = None
         self.goal = False
         self.statuschange = False
         self.newmatch = False
         self.homebadge = None
         self.awaybadge = None
-        self.matchid = None
-        self.matchlink = None
-        self.rawincidents = []
+        self.incidents = IncidentStore()
         self.booking = False
         self.redcard = False
         self.leagueid = None
 
 
     def __findMatch(self):
-        leaguepage = self.getPage(self.livescoreslink.format(comp=""))
+        # Start with the default page so we can get list of active leagues
+        livescores = self.getLiveScores()
         data = None
         teamfound = False
 
-        if leaguepage:
+        if livescores:
+
+            # Stops the remaining leagues being searched once we've found
+            # our team
+            found = threading.Event()
+
+            def searchLeague(competition):
+
+                league = competition["id"]
 
-            # Start with the default page so we can get list of active leagues
-            raw =  BeautifulSoup(leaguepage)
-            
-            # Find the list of active leagues
-            selection = raw.find("div", {"class": 
-                                         "drop-down-filter live-scores-fixtures"})
-            
-    
-            # Loop throught the active leagues
-            for option in selection.findAll("option"):
-                
                 # Build the link for that competition
-                league = option.get("value")[12:]
-                
-                if league:
-                    scorelink = self.livescoreslink.format(comp=league)
+                scorelink = self.livescoreslink.format(comp=league)
 
-                    scorepage = self.getPage(scorelink)
-                
-                    if scorepage:
-                        # Prepare to process page
-                        optionhtml = BeautifulSoup(scorepage)
-                        
-                        # We just want the live games...
-                        live = optionhtml.find("div", {"id": "matches-wrapper"})
-                        
-                        # Let's look for our team
-                        if live.find(text=self.myteam):
-                            teamfound = True
-                            self.scorelink = scorelink
-                            self.competition = option.text.split("(")[0].strip()
-                            self.leagueid = league
-                            data = live
-                            break
+                leaguescores = self.getLiveScores(league)
+            
+                # Let's look for our team
+                if leaguescores and leaguescores.matches.find(self.myteam):
+                    found.set()
+                    return (competition, scorelink, leaguescores.matches)
+
+            # Search the active leagues
+            results = runConcurrently(searchLeague, 
+                                      [c for c in livescores.competitions 
+                                       if c["id"]],
+                                      workers=self.workers,
+                                      stop=found)
+
+            for result in results:
+                if isinstance(result, tuple):
+                    competition, scorelink, live = result
+                    teamfound = True
+                    self.scorelink = scorelink
+                    self.competition = competition["name"]
+                    self.leagueid = competition["id"]
+                    data = live
+                    break
         
         self.matchfound = teamfound
                     
@@ -186,53 +1506,12 @@ class FootballMatch(matchcommon):
 
     def __getScores(self, data, update = False):
 
-        for match in data.findAll("tr", {"id": re.compile(r'^match-row')}):
-            if match.find(text=self.myteam):
-
-                self.hometeam = match.find("span", {"class": "team-home"}).text ## ENCODE
-                
-                self.awayteam = match.find("span", {"class": "team-away"}).text
+        with timings.timer("diff"):
+            match = data.find(self.myteam)
 
-                linkrow = match.find("td", {"class": "match-link"})
-                try:
-                    link = linkrow.find("a").get("href")
-                    self.matchlink = "http://www.bbc.co.uk%s" % (link)
-                except AttributeError:
-                    self.matchlink = None 
-        
-                if match.get("class") == "fixture":
-                    status = "Fixture"
-                    matchtime = match.find("span", 
-                                     {"class": 
-                                     "elapsed-time"}).text.strip()[:5]
-
-                elif match.get("class") == "report":
-                    status = "FT"
-                    matchtime = None
-
-                elif ("%s" % 
-                     (match.find("span", 
-                     {"class": "elapsed-time"}).text.strip()) == "Half Time"):
-                    status = "HT"
-                    matchtime = None
+            if match:
 
-                else:
-                    status = "L"
-                    matchtime = match.find("span", 
-                                     {"class": "elapsed-time"}).text.strip()
-        
-                matchid = match.get("id")[10:]
-        
-                score = match.find("span", 
-                                 {"class": "score"}).text.strip().split(" - ")
-                
-                try:
-                    homescore = int(score[0].strip())
-                    awayscore = int(score[1].strip())
-                
-                except:
-                    homescore = 0
-                    awayscore = 0
+                self.__scoretime = UKClock.clock()
 
                 self.statuschange = False
                 self.newmatch = False
@@ -240,24 +1519,19 @@ class FootballMatch(matchcommon):
 
                 if update:
 
-                    if not status == self.status:
+                    if not match.status == self.status:
                         self.statuschange = True
-                    
-                    if not matchid == self.matchid:
+                
+                    if not match.matchid == self.matchid:
                         self.newmatch = True
 
-                    if not (homescore == self.homescore and
-                            awayscore == self.awayscore):
+                    if not (match.homescore == self.homescore and
+                            match.awayscore == self.awayscore):
                         # Gooooooooooooaaaaaaaaaaaaaaaaallllllllllllllllll!
                         self.goal = True
 
-                self.status = status if status else None ## ENCODE
-                self.matchtime = matchtime if matchtime else None ## ENCODE
-                self.matchid = matchid if matchid else None ## ENCODE
-                self.homescore = homescore
-                self.awayscore = awayscore
+                self.state = match
 
-        
     def __update(self, data = None):
  
         self.__getScores(data)
@@ -265,124 +1539,256 @@ class FootballMatch(matchcommon):
         if self.detailed:
             self.__getDetails()
 
-    def __loadData(self, data = None):
+    def __loadData(self, data = None):
+
+        self.matchfound = False
+
+        if data:
+            if not isinstance(data, MatchIndex):
+                data = MatchIndex(data)
+
+            if data.find(self.myteam):
+                self.matchfound = True
+            else:
+                data = None
+
+        if not data and self.scorelink:
+            scorepage = self.getPage(self.scorelink)
+            if scorepage:
+                with timings.timer("parse") as t:
+                    t.nbytes = len(scorepage)
+                    data = LiveScoresParser(scorepage).matches
+                if data.find(self.myteam):
+                    self.matchfound = True
+                else:
+                    data = None
+            else:
+                data = None
+
+        if not data:
+            data = self.__findMatch()
+
+        if not data:
+            self.__resetMatch()
+       
+        return data
+    
+    def clearFlags(self):
+        '''Clears the notification flags without updating the match.'''
+        self.goal = False
+        self.statuschange = False
+        self.newmatch = False
+        self.booking = False
+        self.redcard = False
+
+    def getEvents(self):
+        '''Returns a list of MatchEvents for the changes found by the last
+        update.
+        '''
+        events = []
+        new = self.incidents.new
+
+        for flag, event, incidenttype in ((self.goal, EVENT_GOAL, "goal"),
+                                          (self.statuschange, EVENT_STATUS, 
+                                           None),
+                                          (self.newmatch, EVENT_NEWMATCH, 
+                                           None),
+                                          (self.booking, EVENT_BOOKING, 
+                                           "yellow"),
+                                          (self.redcard, EVENT_REDCARD, 
+                                           "red")):
+            if flag:
+                events.append(MatchEvent(event, 
+                                         self,
+                                         [i for i in new 
+                                          if i[1] == incidenttype]))
+
+        return events
+
+    def Update(self, data = None):
+        '''Updates the match.
+
+        Returns a list of MatchEvents for anything that has changed.
+        '''
+
+        self.__updateScores(data)
+
+        if self.detailed:
+            self.__getDetails()
+
+        return self.getEvents()
+
+    def __updateScores(self, data = None):
+
+        if data is None:
+
+            # If our page hasn't changed, there's nothing new to process
+            if self.matchfound and self.scorelink:
+                changed, self.__digest = self.checkPage(self.scorelink,
+                                                        self.__digest)
+                if not changed:
+                    self.__scoretime = UKClock.clock()
+                    self.clearFlags()
+                    return
+
+        else:
+            # Data is coming from elsewhere so we can't trust our digest
+            self.__digest = None
+
+        data = self.__loadData(data)
+
+        if data:
+            self.__getScores(data, update = True)
+
+    @property
+    def ScoreAge(self):
+        '''Number of seconds since the score was last checked (None if
+        it's never been found).
+        '''
+        if self.__scoretime is None:
+            return None
+
+        return UKClock.clock() - self.__scoretime
+
+    def detailsDue(self, state):
+        '''Returns True if updating the match to state (a MatchState)
+        would mean fetching the incidents again (see __detailsDue).
+        '''
+        if self.__detailtime is None:
+            return True
+
+        if (state.matchid != self.matchid or state.status != self.status or
+            state.homescore != self.homescore or 
+            state.awayscore != self.awayscore):
+            return True
 
-        self.matchfound = False
+        return (state.status == "L" and 
+                UKClock.clock() - self.__detailtime >= self.detailttl)
 
-        if data:
-            if data.find(text=self.myteam):
-                self.matchfound = True
-            else:
-                data = None
+    def __detailsDue(self):
+        '''Returns True if the incidents need to be fetched again.
 
-        if not data and self.scorelink:
-            scorepage = self.getPage(self.scorelink)
-            if scorepage:
-                scorehtml = BeautifulSoup(scorepage)
-                data = scorehtml.find("div", {"id": "matches-wrapper"})
-                if data.find(text=self.myteam):
-                    self.matchfound = True
-                else:
-                    data = None
-            else:
-                data = None
+        That's if we've never fetched them, the score or status has changed
+        or the match is in progress and they're older than detailttl.
+        '''
+        if self.__detailtime is None:
+            return True
 
-        if not data:
-            data = self.__findMatch()
+        if self.goal or self.statuschange or self.newmatch:
+            return True
 
-        if not data:
-            self.__resetMatch()
-       
-        return data
-    
-    def Update(self, data = None):
+        return (self.status == "L" and 
+                UKClock.clock() - self.__detailtime >= self.detailttl)
 
-        data = self.__loadData(data)
+    def UpdateDetails(self, maxage = None):
+        '''Fetches the incidents (goals and cards) for the match straight
+        away, even if they wouldn't normally be due.
 
-        if data:
-            self.__getScores(data, update = True)
+        Only the incidents page for our matchid is downloaded. The score we
+        already have is kept unless it's older than maxage seconds, in which
+        case the score is updated first.
 
-        if self.detailed:
-            self.__getDetails()
+        Returns a list of MatchEvents for anything that has changed.
+        '''
+        age = self.ScoreAge
+
+        if maxage is not None and (age is None or age > maxage):
+            self.__updateScores()
+        else:
+            self.clearFlags()
+
+        self.__getDetails(force=True)
 
-    def __getDetails(self):
+        return self.getEvents()
+
+    def __getDetails(self, force = False):
         
+        # Nothing that could change the incidents since we last looked
+        if not (force or self.__detailsDue()):
+            self.booking = False
+            self.redcard = False
+            self.incidents.clearNew()
+            return
+
         if self.matchid:
-            # Prepare bautiful soup to scrape match page
+            detaillink = self.detailprefix.format(id=self.matchid)
+            self.__detailtime = UKClock.clock()
+
+            # Don't parse the incidents again if they haven't changed
+            changed, digest = self.checkPage(detaillink, 
+                                             self.__detaildigest)
+            if not changed:
+                self.booking = False
+                self.redcard = False
+                self.incidents.clearNew()
+                return
 
+            # Prepare bautiful soup to scrape match page
 
                 # Let's get the home and away team detail sections
             try:
-                bs =  BeautifulSoup(self.getPage(self.detailprefix.format(
-                                             id=self.matchid)))
-                incidents = bs.find("table", 
-                                   {"class": "incidents-table"}).findAll("tr")
+                page = self.getPage(detaillink)
+                with timings.timer("parse") as timer:
+                    timer.nbytes = len(page or "")
+                    bs =  BeautifulSoup(page)
+                    incidents = bs.find("table", 
+                                       {"class": "incidents-table"}
+                                       ).findAll("tr")
+                self.__detaildigest = digest
             except:
                 incidents = None
+                self.__detaildigest = None
 
             # Get incidents
             # This populates variables with details of scorers and bookings
             # Incidents are stored in a list of tuples: format is:
             # [(Player Name, [times of incidents])]
-            hsc = []
-            asc = []
-            hyc = []
-            ayc = []
-            hrc = []
-            arc = []
-            
             if incidents:
 
-                self.__goalscorers = []
-                self.__yellowcards = []
-                self.__redcards = []
+                with timings.timer("diff"):
+                    found = []
 
-                for incident in incidents:
-                    i = incident.find("td", 
-                                     {"class": 
-                                     re.compile(r"\bincident-type \b")})
-                    if i:
-                        h = incident.find("td", 
+                    for incident in incidents:
+                        i = incident.find("td", 
                                          {"class": 
-                                         "incident-player-home"}).text.strip()
+                                         re.compile(r"\bincident-type \b")})
+                        if i:
+                            h = incident.find("td", 
+                                             {"class": 
+                                             "incident-player-home"}).text.strip()
                         
-                        a = incident.find("td", 
-                                         {"class": 
-                                         "incident-player-away"}).text.strip()
+                            a = incident.find("td", 
+                                             {"class": 
+                                             "incident-player-away"}).text.strip()
                         
-                        t = incident.find("td", 
-                                         {"class": 
-                                         "incident-time"}).text.strip()
-
-                        if "goal" in i.get("class"):     
-                            if h:
-                                hsc = self.__addIncident(hsc, h, t) ## ENCODE
-                                self.__goalscorers.append((self.hometeam, h, t))
-                                self.__addRawIncident("home", "goal", h, t)
-                            else:
-                                asc = self.__addIncident(asc, a, t)
-                                self.__goalscorers.append((self.awayteam, a, t))
-                                self.__addRawIncident("away", "goal", a, t)
+                            t = incident.find("td", 
+                                             {"class": 
+                                             "incident-time"}).text.strip()
+
+                            team, player = ("home", h) if h else ("away", a)
+
+                            if "goal" in i.get("class"):     
+                                found.append((team, "goal", player, t)) ## ENCODE
                         
-                        elif "yellow-card" in i.get("class"):
-                            if h:
-                                hyc = self.__addIncident(hyc, h, t)
-                                self.__yellowcards.append((self.hometeam, h, t))
-                                self.__addRawIncident("home", "yellow", h, t)
-                            else:
-                                ayc = self.__addIncident(ayc, a, t)
-                                self.__yellowcards.append((self.awayteam, a, t))
-                                self.__addRawIncident("away", "yellow", a, t)
-
-                        elif "red-card" in i.get("class"):
-                            if h:
-                                hrc = self.__addIncident(hrc, h, t)
-                                self.__redcards.append((self.hometeam, h, t))
-                                self.__addRawIncident("home", "red", h, t)
-                            else:
-                                arc = self.__addIncident(arc, a, t)
-                                self.__redcards.append((self.awayteam, a, t))
-                                self.__addRawIncident("away", "red", a, t)
+                            elif "yellow-card" in i.get("class"):
+                                found.append((team, "yellow", player, t))
+
+                            elif "red-card" in i.get("class"):
+                                found.append((team, "red", player, t))
+
+                    self.incidents.update(found)
+
+                players = self.incidents.players
+                hsc = players("home", "goal")
+                asc = players("away", "goal")
+                hyc = players("home", "yellow")
+                ayc = players("away", "yellow")
+                hrc = players("home", "red")
+                arc = players("away", "red")
+
+            else:
+                self.incidents.clearNew()
+                hsc, asc, hyc, ayc, hrc, arc = [], [], [], [], [], []
 
             self.booking = not (self.homeyellowcards == hyc and 
                                 self.awayyellowcards == ayc)
@@ -397,26 +1803,32 @@ class FootballMatch(matchcommon):
             self.homeredcards = hrc
             self.awayredcards = arc
 
-    def __addIncident(self, incidentlist, player, incidenttime):
-        '''method to add incident to list variable'''
-        found = False
-        for incident in incidentlist:
-            if incident[0] == player:
-                incident[1].append(incidenttime)
-                found = True
-                break
-
-        if not found:
-            incidentlist.append((player, [incidenttime]))
-
-        return incidentlist
+    @property
+    def rawincidents(self):
+        '''List of every incident seen for the match in the format
+        (team, incident type, player, time)
+        '''
+        return self.incidents.rawincidents
 
-    def __addRawIncident(self, team, incidenttype, player, incidenttime):
+    @property
+    def NewIncidents(self):
+        """Returns list of incidents first seen in the latest update
+        
+        """
+        return self.incidents.new
 
-        incident = (team, incidenttype, player, incidenttime)
+    def __lastIncident(self, incidenttype):
+        '''Returns latest incident of incidenttype as a tuple of
+        (team name, player, time)
+        '''
+        if self.detailed:
+            incident = self.incidents.last(incidenttype)
+            if incident:
+                team, _, player, incidenttime = incident
+                teamname = self.hometeam if team == "home" else self.awayteam
+                return (teamname, player, incidenttime)
 
-        if not incident in self.rawincidents:
-            self.rawincidents.append(incident)
+        return None
 
     def formatIncidents(self, incidentlist, newline = False):
         '''Incidents are in the following format:
@@ -608,33 +2020,15 @@ class FootballMatch(matchcommon):
 
     @property
     def LastGoalScorer(self):
-        if self.detailed:
-            if self.__goalscorers:
-                return self.__goalscorers[-1]
-            else:
-                return None
-        else:
-            return None
+        return self.__lastIncident("goal")
 
     @property
     def LastYellowCard(self):
-        if self.detailed:
-            if self.__yellowcards:
-                return self.__yellowcards[-1]
-            else:
-                return None
-        else:
-            return None
+        return self.__lastIncident("yellow")
 
     @property
     def LastRedCard(self):
-        if self.detailed:
-            if self.__redcards:
-                return self.__redcards[-1]
-            else:
-                return None
-        else:
-            return None
+        return self.__lastIncident("red")
 
     @property
     def MatchDate(self):
@@ -753,17 +2147,18 @@ class FootballMatch(matchcommon):
 
         Returns None if unable to parse match time or if match in progress.
 
-        Should be unaffected by timezones as it gets current time from bbc
-        server which *should* be the same timezone as matches shown.
+        Should be unaffected by timezones as it uses the current UK time
+        (see UKClock) which *should* be the same timezone as matches shown.
         '''
         if self.status == "Fixture":
             try:
                 koh = int(self.matchtime[:2])
                 kom = int(self.matchtime[3:5])
+                uktime = self.__getUKTime()
                 kickoff = datetime.combine(
-                            datetime.now().date(),
+                            uktime.date(),
                             time(koh, kom, 0))
-                timetokickoff = kickoff - self.__getUKTime()
+                timetokickoff = kickoff - uktime
             except Exception, e:
                 timetokickoff = None
             finally:
@@ -801,47 +2196,85 @@ class League(matchcommon):
     accordionlink = ("http://polling.bbc.co.uk/sport/shared/football/"
                      "accordion/partial/collated")
 
-    def __init__(self, league, detailed=False):
+    def __init__(self, league, detailed=False, data=None, leaguename=None):
+        '''Creates a League object for the given league id.
+
+        data and leaguename can be given to build the league from data we
+        already have (e.g. a MatchIndex restored from a snapshot) without
+        downloading the page. The next Update then compares the live page
+        with that data.
+
+        Otherwise FetchError (or RequestCancelled) is raised if the page
+        can't be downloaded. A league with no matches today is just empty.
+        '''
+
+        # Identifies the version of the league page that we last processed
+        self.__digest = None
+        self.__data = data
+        self.__events = []
 
-        self.__leaguematches = self.__getMatches(league,detailed=detailed)
+        self.__leaguematches = self.__getMatches(league,
+                                                 detailed=detailed,
+                                                 data=data)
         self.__leagueid = league
-        self.__leaguename = self.__getLeagueName(league)
+
+        if data is None:
+            if self.__data:
+                _, self.__digest = self.checkPage(
+                                    self.livescoreslink.format(comp=league),
+                                    None)
+            leaguename = self.__getLeagueName(league)
+
+        self.__leaguename = leaguename
         self.__detailed = detailed
 
+    @classmethod
+    def fromSnapshot(cls, snapshot):
+        '''Creates a League from a dict created by the snapshot method.'''
+        data = MatchIndex()
+
+        for match in snapshot["matches"]:
+            data.addRow(MatchState(**match))
+
+        return cls(snapshot["id"],
+                   detailed=snapshot["detailed"],
+                   data=data,
+                   leaguename=snapshot["name"])
+
+    def snapshot(self):
+        '''Returns the current state of the league as a dict which can be
+        saved as JSON and restored with fromSnapshot.
+        '''
+        return {"id": self.__leagueid,
+                "name": self.__leaguename,
+                "detailed": self.__detailed,
+                "matches": [m.state._asdict() for m in self.__leaguematches
+                            if m.matchfound]}
+
     def __getData(self, league):
 
-        scorelink = self.livescoreslink.format(comp=league)
         data = None
         # Prepare to process page
-        optionpage = self.getPage(scorelink)
-        if optionpage:
-            optionhtml = BeautifulSoup(optionpage)
+        livescores = self.getLiveScores(league)
+        if livescores:
             
             # We just want the live games...
-            data = optionhtml.find("div", {"id": "matches-wrapper"})
+            data = livescores.matches
 
         return data
 
     def __getLeagueName(self, league):
 
         leaguename = None
-        rawpage = self.getPage(self.livescoreslink.format(comp=league))
+        livescores = self.getLiveScores(league)
 
-        if rawpage:
-            raw =  BeautifulSoup(rawpage)
-            
-            # Find the list of active leagues
-            selection = raw.find("div", 
-                                {"class": 
-                                 "drop-down-filter live-scores-fixtures"})
-          
-            if selection:
+        if livescores:
 
-                selectedleague = selection.find("option", 
-                                               {"selected": "selected"})
-            
-                if selectedleague:
-                    leaguename = selectedleague.text.split("(")[0].strip()
+            # Find the selected league in the list of active leagues
+            for competition in livescores.competitions:
+                if competition["selected"]:
+                    leaguename = competition["name"]
+                    break
 
         return leaguename
 
@@ -858,26 +2291,17 @@ class League(matchcommon):
         #     leagues.append(league)
             
         # return leagues
-        livescoreslink = matchcommon().livescoreslink
 
         # Start with the default page so we can get list of active leagues
-        rawpage = matchcommon().getPage(livescoreslink.format(comp=""))
-        if rawpage: 
-            raw =  BeautifulSoup(rawpage)
-            
-            # Find the list of active leagues
-            selection = raw.find("div", 
-                                {"class": 
-                                 "drop-down-filter live-scores-fixtures"})
+        livescores = matchcommon().getLiveScores()
+        if livescores: 
           
             # Loop throught the active leagues
-            for option in selection.findAll("option"):
+            for competition in livescores.competitions:
                 
-                # Build the link for that competition
-                # league = option.get("value")[12:]
                 league = {}
-                league["name"] = option.text.split("(")[0].strip()
-                league["id"] = option.get("value")[12:]
+                league["name"] = competition["name"]
+                league["id"] = competition["id"]
                 if league["id"]:
                     leagues.append(league)
 
@@ -886,20 +2310,45 @@ class League(matchcommon):
     def __getMatches(self, league, detailed=False, data = None):
 
         if data is None:
+            self.fetchPages([self.livescoreslink.format(comp=league)])
             data = self.__getData(league)
+            self.__data = data
 
         matches = []
 
-        rawmatches = data.findAll("tr", {"id": re.compile(r'^match-row')})
+        # No data means there are no matches (or no page at all)
+        for match in data or []:
+            matches.append(self.__makeMatch(league, match.hometeam, data,
+                                            detailed=detailed))
+
+        return matches
+
+    def __detailLinks(self, data):
+        '''Returns the links to the incidents of the matches in data which
+        will need them fetched when they're updated.
+        '''
+        current = dict((m.matchid, m) for m in self.__leaguematches)
+        links = []
+
+        for state in data:
+            match = current.get(state.matchid)
+            if state.matchid and (match is None or match.detailsDue(state)):
+                links.append(FootballMatch.detailprefix.format(
+                                                        id=state.matchid))
 
-        if rawmatches:
+        return links
 
-            for match in rawmatches:
-                team = match.find("span", {"class": "team-home"}).text
-                m = FootballMatch(team, detailed=detailed, data=data)
-                matches.append(m)
+    def __makeMatch(self, league, team, data, detailed=False):
 
-        return matches
+        m = FootballMatch(team, detailed=detailed, data=data)
+
+        # Let the match update itself from our page rather than having
+        # to search for it
+        if m.matchfound:
+            m.scorelink = self.livescoreslink.format(comp=league)
+            m.leagueid = league
+
+        return m
 
     def __repr__(self):
         return "League(\'%s\', detailed=%s)" % (self.__leagueid,
@@ -924,21 +2373,66 @@ class League(matchcommon):
         If there are no games (e.g. a new day) then the old macthes are removed.
 
         If there are new games, these are added.
+
+        Returns a list of MatchEvents for the changes found (also
+        available from LeagueEvents until the next update).
+
+        Every page that's needed is downloaded before anything is changed.
+        If one of them can't be downloaded then FetchError (or
+        RequestCancelled) is raised and the league is left as it was.
         '''
 
-        # Get the data for league
-        data = self.__getData(self.__leagueid)
+        scorelink = self.livescoreslink.format(comp=self.__leagueid)
+
+        self.fetchPages([scorelink])
+
+        # If the page hasn't changed since our last update then we don't
+        # need to parse it again
+        changed, digest = self.checkPage(scorelink, self.__digest)
+
+        if changed:
+            data = self.__getData(self.__leagueid)
+        else:
+            data = self.__data
+
+        if self.__detailed and data:
+            self.fetchPages(self.__detailLinks(data))
+
+        # Everything we need is in the page cache now
+        events = []
+        self.__events = events
+
+        if not changed:
+
+            for match in self.__leaguematches:
+                
+                # Detailed matches still need their incidents checked
+                if self.__detailed:
+                    events += match.Update(data=self.__data)
+                else:
+                    match.clearFlags()
+
+            return events
+
+        self.__data = data
+        self.__digest = digest if data else None
 
         # We've found some data so let's process
         if data:
-            # Get a list of the current matches from the new data
-            currentmatches = self.__getMatches(self.__leagueid, data=data)
+            # Let everyone know about matches that have gone
+            events += [MatchEvent(EVENT_REMOVED, m, []) 
+                       for m in self.__leaguematches
+                       if m.matchid not in data]
 
             # If the match is already in our league, then we keep it
-            self.__leaguematches = [m for m in self.__leaguematches if m in currentmatches]
+            self.__leaguematches = [m for m in self.__leaguematches
+                                    if m.matchid in data]
 
             # Check if there are any matches in the new data which aren't in our list
-            newmatches = [m for m in currentmatches if m not in self.__leaguematches]
+            current = set(m.matchid for m in self.__leaguematches)
+            newmatches = [self.__makeMatch(self.__leagueid, match.hometeam, 
+                                           data)
+                          for match in data if match.matchid not in current]
 
             # If so...
             if newmatches:
@@ -963,21 +2457,31 @@ class League(matchcommon):
                     # NB we need to update each match to ensure the "Goal"
                     # flag is updated appropriately, rather than just adding a new match
                     # object.
-                    match.Update(data=data)
+                    events += match.Update(data=data)
+
+            events += [MatchEvent(EVENT_NEWMATCH, m, []) for m in newmatches]
 
         else:
             # If there's no data, there are no matches...
+            events += [MatchEvent(EVENT_REMOVED, m, []) 
+                       for m in self.__leaguematches]
             self.__leaguematches = []
 
         # If we haven't managed to set the league name yet
         # then we should be able to find it if there are some matches
         if self.__leaguematches and self.LeagueName is None:
-            self.LeagueName = self.__getLeagueName(self.__leagueid)
+            self.__leaguename = self.__getLeagueName(self.__leagueid)
+
+        return events
 
     @property 
     def LeagueMatches(self):
         return self.__leaguematches
 
+    @property
+    def LeagueEvents(self):
+        return self.__events
+
     @property
     def LeagueName(self):
         return self.__leaguename
@@ -986,15 +2490,158 @@ class League(matchcommon):
     def LeagueID(self):
         return self.__leagueid
 
+class PollScheduler(object):
+    '''Works out when each league next needs to be checked for updates.
+
+    Leagues with matches in progress are checked often, leagues with only
+    fixtures are checked shortly before the first kick-off and leagues
+    where everything has finished are checked rarely.
+    '''
+
+    # Intervals are in seconds
+    live = 60
+    idle = 60 * 60
+
+    # How long before kick-off we start checking a league frequently
+    prematch = 5 * 60
+
+    def __init__(self, clock=None):
+        '''clock - function returning the current time in seconds.'''
+        self.clock = clock or UKClock.clock
+        self.__nextpoll = {}
+
+    def interval(self, league):
+        '''Returns the number of seconds until league should next be
+        checked, based on the state of its matches.
+        '''
+        wait = self.idle
+
+        for match in league.LeagueMatches:
+
+            if match.status in ("L", "HT"):
+                return self.live
+
+            elif match.status == "Fixture":
+                kickoff = match.TimeToKickOff
+
+                # If we can't tell when the match starts, play safe
+                if kickoff is None:
+                    return self.live
+
+                kickoff = (kickoff.days * 86400 + kickoff.seconds 
+                           - self.prematch)
+
+                wait = min(wait, max(kickoff, self.live))
+
+        return wait
+
+    def schedule(self, leagueid, league):
+        '''Sets the next check for league after it has been updated.'''
+        self.__nextpoll[leagueid] = self.clock() + self.interval(league)
+
+    def retry(self, leagueid):
+        '''Sets the next check for a league whose update failed. Its old
+        data can't tell us how long to wait so it's tried again soon.
+        '''
+        self.__nextpoll[leagueid] = self.clock() + self.live
+
+    def due(self, leagueids):
+        '''Returns the list of leagueids that need checking now.
+
+        Leagues we haven't seen before are always due. Leagues not in
+        leagueids are forgotten.
+        '''
+        now = self.clock()
+
+        for leagueid in list(self.__nextpoll):
+            if leagueid not in leagueids:
+                del self.__nextpoll[leagueid]
+
+        return [l for l in leagueids if self.__nextpoll.get(l, now) <= now]
+
+    def nextPoll(self, leagueid):
+        '''Returns the time that leagueid is next due (or None).'''
+        return self.__nextpoll.get(leagueid)
+
+
+class LastGame(namedtuple("LastGame", ["result", "score", "opponent", 
+                                       "date", "summary"])):
+    '''One of the last ten games shown for a team in a league table.'''
+
+    __slots__ = ()
+
+
+class LeagueTableTeam(namedtuple("LeagueTableTeam", ["name", 
+                                                     "position",
+                                                     "played",
+                                                     "won",
+                                                     "drawn",
+                                                     "lost",
+                                                     "goalsfor",
+                                                     "goalsagainst",
+                                                     "goaldifference",
+                                                     "points",
+                                                     "lasttengames"])):
+    '''One row of a league table.'''
+
+    __slots__ = ()
+
+    @classmethod
+    def fromTag(cls, team):
+        '''Creates the row from a BeautifulSoup table row.'''
+
+        f = team.find
+
+        try:
+            lastgames = f("td", {"class": "last-10-games"})
+            lasttengames = tuple(LastGame(game.get("class"),
+                                          game.get("data-result"),
+                                          game.get("data-against"),
+                                          game.get("data-date"),
+                                          game.get("title"))
+                                 for game in lastgames.findAll("li"))
+        except:
+            lasttengames = ()
+
+        return cls(f("td", {"class": "team-name"}).text,
+                   int(f("span", {"class": "position-number"}).text),
+                   int(f("td", {"class": "played"}).text),
+                   int(f("td", {"class": "won"}).text),
+                   int(f("td", {"class": "drawn"}).text),
+                   int(f("td", {"class": "lost"}).text),
+                   int(f("td", {"class": "for"}).text),
+                   int(f("td", {"class": "against"}).text),
+                   int(f("td", {"class": "goal-difference"}).text),
+                   int(f("td", {"class": "points"}).text),
+                   lasttengames)
+
+    def __repr__(self):
+        return "<LeagueTableTeam object - %s>" % self.name
+
+    def __str__(self):
+        return "%d %s %d" % (self.position,
+                             self.name,
+                             self.points)
+
+
 class LeagueTable(matchcommon):
-    '''class to convert BBC league table format into python list/dict.'''
+    '''class to convert BBC league table format into python list/dict.
+
+    Tables are kept for a while after they're downloaded. How long depends
+    on the competition's matches: not long if any are being played, but
+    until the next kick-off (or an hour) if not.
+    '''
 
     leaguebase = "http://www.bbc.co.uk/sport/football/tables"
     leaguemethod = "filter"
     
     def __init__(self):
         #self.availableLeague = self.getLeagues()
-        pass
+
+        # key=league id
+        # value=(expiry time, table)
+        self.__tables = {}
+        self.__lock = threading.Lock()
     
     def getLeagues(self):
         '''method for getting list of available leagues'''
@@ -1012,53 +2659,77 @@ class LeagueTable(matchcommon):
                 l["id"] = league.get("value")
                 leaguelist.append(l)
         return leaguelist
-        
+
+    def getCachedTable(self, leagueid):
+        '''Returns the table for leagueid if we've got an up to date copy,
+        otherwise None.
+        '''
+        with self.__lock:
+            expiry, table = self.__tables.get(leagueid, (0, None))
+
+        if UKClock.clock() < expiry:
+            return table
+
+        return None
+
+    def invalidate(self, leagueid=None):
+        '''Forgets the table for leagueid (or all tables).'''
+        with self.__lock:
+            if leagueid is None:
+                self.__tables.clear()
+            else:
+                self.__tables.pop(leagueid, None)
+
     def getLeagueTable(self, leagueid):
         '''method for creating league table of selected league.'''
 
-        result = []
+        table = self.getCachedTable(leagueid)
 
-        class LeagueTableTeam(object):
-
-            def __init__(self, team):
-
-                f = team.find
-                self.name = f("td", {"class": "team-name"}).text
-                self.position = int(f("span", 
-                                     {"class": "position-number"}).text)
-                self.played = int(f("td", {"class": "played"}).text)
-                self.won = int(f("td", {"class": "won"}).text)
-                self.drawn = int(f("td", {"class": "drawn"}).text)
-                self.lost = int(f("td", {"class": "lost"}).text)            
-                self.goalsfor = int(f("td", {"class": "for"}).text)
-                self.goalsagainst = int(f("td", {"class": "against"}).text) 
-                self.goaldifference = int(f("td", 
-                                           {"class": "goal-difference"}).text)
-                self.points = int(f("td", {"class": "points"}).text)  
-                
-                try:
-                    lastgames = f("td", {"class": "last-10-games"})
-                    lg = []
-                    for game in lastgames.findAll("li"):
-                        g = {}
-                        g["result"] = game.get("class")
-                        g["score"] = game.get("data-result")
-                        g["opponent"] = game.get("data-against")
-                        g["date"] = game.get("data-date")
-                        g["summary"] = game.get("title")
-                        lg.append(g)
-                    self.lasttengames = lg
-                
-                except:
-                    self.lasttengames = []
+        if table is None:
+
+            # The live scores page tells us how long we can keep the table
+            # so get both pages at the same time
+            table, ttl = runConcurrently(lambda f: f(leagueid), 
+                                         [self.__getLeagueTable, 
+                                          self.__tableTTL],
+                                         workers=2)
+
+            if isinstance(table, Exception):
+                raise table
+
+            if isinstance(ttl, Exception):
+                ttl = PollScheduler.live
+
+            with self.__lock:
+                self.__tables[leagueid] = (UKClock.clock() + ttl, table)
 
-                def __repr__(self):
-                    return "<LeagueTableTeam object - %s>" % self.name
+        return table
 
-            def __str__(self):
-                return "%d %s %d" % (self.position,
-                                     self.name,
-                                     self.points)
+    def __tableTTL(self, leagueid):
+        '''Returns how long the table for leagueid can be kept, based on
+        the state of the competition's matches today.
+        '''
+        league = leagueid.replace("competition-", "")
+
+        try:
+            self.fetchPages([self.livescoreslink.format(comp=league)])
+
+        # We can't tell if there are any matches so check again soon
+        except FetchError:
+            return PollScheduler.live
+
+        livescores = self.getLiveScores(league)
+
+        # No matches today (or no page for them) means it won't change
+        if livescores is None:
+            return PollScheduler.idle
+
+        return PollScheduler().interval(League(league,
+                                               data=livescores.matches))
+
+    def __getLeagueTable(self, leagueid):
+
+        result = []
 
         leaguepage = "%s?%s=%s" % (self.leaguebase,
                                    self.leaguemethod,
@@ -1069,7 +2740,6 @@ class LeagueTable(matchcommon):
         for table in raw.findAll("div", {"class": "league-table full-table-wide"}):
 
             lg = {}
-            teamlist = []
 
             leaguename = table.find("h2", {"class": "table-header"})
             
@@ -1078,12 +2748,9 @@ class LeagueTable(matchcommon):
                     nest.extract()
             
             lg["name"] = leaguename.text.strip()
-            
-            for team in table.findAll("tr", {"id": re.compile(r'team')}):
-                t = LeagueTableTeam(team)
-                teamlist.append(t)
+            lg["table"] = [LeagueTableTeam.fromTag(team) for team in 
+                           table.findAll("tr", {"id": re.compile(r'team')})]
 
-            lg["table"] = teamlist
             result.append(lg)
             
         return result
@@ -1093,54 +2760,225 @@ class Teams(matchcommon):
 
     def getTeams(self):
         # Start with the default page so we can get list of active leagues
-        rawpage = self.getPage(self.livescoreslink.format(comp=""))
+        livescores = self.getLiveScores()
         teamlist = []
         
-        if rawpage:
-            raw =  BeautifulSoup(rawpage)
-            
-            # Find the list of active leagues
-            selection = raw.find("div", {"class": 
-                                         "drop-down-filter live-scores-fixtures"})
-          
-            # Loop throught the active leagues
-            for option in selection.findAll("option"):
-                
-                # Build the link for that competition
-                league = option.get("value")[12:]
-                
-                if league:
-                    scorelink = self.livescoreslink.format(comp=league)
-                
-                    # Prepare to process page
-                    scorepage = self.getPage(scorelink)
-                    if scorepage:
-                        optionhtml = BeautifulSoup(scorepage)
-                        
-                        # We just want the live games...
-                        live = optionhtml.find("div", 
-                                              {"id": "matches-wrapper"})
+        if livescores:
 
-                        for match in live.findAll("tr", 
-                                                 {"id": re.compile(r'^match-row')}):
+            def getLeagueTeams(league):
 
-                            teamlist.append(match.find("span", 
-                                                      {"class": "team-home"}).text)
-                            
-                            teamlist.append(match.find("span", 
-                                                      {"class": "team-away"}).text)
-                    
+                teams = []
+
+                # Prepare to process page
+                leaguescores = self.getLiveScores(league)
+                if leaguescores:
+
+                    for match in leaguescores.matches:
+                        teams.append(match.hometeam)
+                        teams.append(match.awayteam)
+
+                return teams
+
+            # Loop throught the active leagues
+            leagues = [c["id"] for c in livescores.competitions if c["id"]]
+
+            for teams in runConcurrently(getLeagueTeams, 
+                                         leagues,
+                                         workers=self.workers):
+                if isinstance(teams, list):
+                    teamlist += teams
 
             teamlist = sorted(teamlist)
                     
         return teamlist
 
+def fetchAllLeagues():
+    '''Returns a tuple of (leagues, complete).
+
+    leagues is a list of all the leagues we know about, in the format
+    {"name": xx, "id": xx}. The league table and live score pages are
+    checked at the same time. If one of them fails then the leagues from
+    the other one are still returned but complete is False. A list that
+    was read but is empty (e.g. no matches today) doesn't count as a
+    failure.
+    '''
+
+    def getTableLeagues():
+        return [{"name": x["name"], "id": x["id"][12:]} 
+                for x in LeagueTable().getLeagues()]
+
+    def getLiveLeagues():
+        # League.getLeagues gives an empty list if the page can't be
+        # downloaded so check for that first (raises FetchError)
+        source = matchcommon()
+        source.fetchPages([source.livescoreslink.format(comp="")])
+        return League.getLeagues()
+
+    leagues = OrderedDict()
+    complete = True
+
+    for result in runConcurrently(lambda source: source(),
+                                  [getTableLeagues, getLiveLeagues],
+                                  workers=2):
+        if isinstance(result, Exception):
+            complete = False
+        else:
+            for league in result:
+                leagues.setdefault(league["id"], league)
+
+    return leagues.values(), complete
+
 def getAllLeagues():
+    '''Returns list of all the leagues we know about, in the format
+    {"name": xx, "id": xx}. See fetchAllLeagues.
+    '''
+    return fetchAllLeagues()[0]
+
+def saveFile(path, data):
+    '''Writes data (a string) to path, creating the folder if needed.
+
+    The data is written to a temporary file which then replaces path, so
+    path always holds either the old or the new version in full.
+    '''
+    if isinstance(data, unicode):
+        data = data.encode("utf-8")
+
+    folder = os.path.dirname(path)
+    tmpfile = path + ".tmp"
+
+    if folder and not os.path.isdir(folder):
+        os.makedirs(folder)
+
+    with open(tmpfile, "wb") as f:
+        f.write(data)
+
+    try:
+        os.rename(tmpfile, path)
+
+    # os.rename won't replace an existing file on Windows
+    except OSError:
+        os.remove(path)
+        os.rename(tmpfile, path)
+
+class LeagueStore(object):
+    '''Master list of leagues saved on disk and keyed by league id.
+
+    Some competitions are only visible when matches are being played so
+    the list only ever grows. It is refreshed from the BBC once it is older
+    than ttl seconds, and can be read at any time without waiting for
+    the network.
+    '''
+
+    ttl = 24 * 60 * 60
+
+    def __init__(self, path, ttl=None):
+
+        self.path = path
+        self.ttl = self.ttl if ttl is None else ttl
+
+        self.__lock = threading.Lock()
+        self.__updated = 0
+        self.__leagues = OrderedDict()
+
+        self.load()
+
+    def __len__(self):
+        return len(self.__leagues)
+
+    def __nonzero__(self):
+        return bool(self.__leagues)
+
+    def __contains__(self, leagueid):
+        return unicode(leagueid) in self.__leagues
+
+    @property
+    def leagues(self):
+        '''List of leagues in the format {"name": xx, "id": xx}'''
+        with self.__lock:
+            return [{"name": name, "id": leagueid}
+                    for leagueid, name in self.__leagues.iteritems()]
+
+    @property
+    def stale(self):
+        return _time.time() - self.__updated > self.ttl
+
+    def load(self):
+        '''Reads the store from disk. A missing or damaged file just leaves
+        the store empty.
+        '''
+        try:
+            with codecs.open(self.path, "r", "utf-8") as store:
+                raw = json.load(store, object_pairs_hook=OrderedDict)
+
+            with self.__lock:
+                self.__leagues = raw["leagues"]
+                self.__updated = raw["updated"]
+
+        except (IOError, ValueError, KeyError, TypeError):
+            pass
+
+    def save(self):
+        '''Writes the store to disk (see saveFile).'''
+        with self.__lock:
+            raw = json.dumps({"updated": self.__updated,
+                              "leagues": self.__leagues})
+
+        saveFile(self.path, raw)
+
+    def merge(self, leagues, updated=False):
+        '''Adds leagues to the store. Leagues that we already have keep their
+        place in the list but take the new name.
+
+        Takes two arguments:
+        leagues:    list of leagues in the format {"name": xx, "id": xx}
+        updated:    True if this is a full refresh from the BBC
+
+        Returns the number of new leagues.
+        '''
+        added = 0
+
+        with self.__lock:
+            for league in leagues:
+                leagueid = unicode(league["id"])
+                if leagueid not in self.__leagues:
+                    added += 1
+                self.__leagues[leagueid] = league["name"]
+
+            if updated:
+                self.__updated = _time.time()
+
+        return added
+
+    def refresh(self):
+        '''Gets the latest leagues from the BBC and saves the store.
+
+        If either of the BBC's lists couldn't be read then the leagues we did
+        get are still added, but the store stays stale so that it's
+        refreshed again next time.
+
+        Returns the number of new leagues.
+        '''
+        leagues, complete = fetchAllLeagues()
+
+        # Nothing came back so we'll try again next time
+        if not leagues:
+            return 0
+
+        added = self.merge(leagues, updated=complete)
+        self.save()
+
+        return added
 
-    tableleagues = LeagueTable().getLeagues()
-    tableleagues = [{"name": x["name"], "id": x["id"][12:]} for x in tableleagues]
-    matchleagues = League.getLeagues()
+    def refreshInBackground(self):
+        '''Starts a refresh in a new thread and returns the thread.'''
+        t = threading.Thread(target=self.refresh)
+        t.start()
+        return t
 
-    tableleagues += [x for x in matchleagues if x not in tableleagues]
+    def clear(self):
+        '''Empties the store.'''
+        with self.__lock:
+            self.__leagues = OrderedDict()
+            self.__updated = 0
 
-    return tableleagues
\ No newline at end of file
+        self.save()
@@ -27,6 +27,7 @@
 
     NB only one parameter should be passed at a time.
 '''
+import os
 import sys
 
 if sys.version_info >=  (2, 7):
@@ -38,11 +39,15 @@ import xbmc
 import xbmcgui
 import xbmcaddon
 
-from resources.lib.footballscores import getAllLeagues
+from resources.lib.footballscores import LeagueStore
 
 _A_ = xbmcaddon.Addon("service.bbclivefootballscores")
 _S_ = _A_.getSetting
 
+# Master list of leagues is kept in the addon's profile folder
+LEAGUE_STORE = os.path.join(xbmc.translatePath(_A_.getAddonInfo("profile")),
+                            "leagues.json")
+
 # Define modes
 STANDARD = 0
 RESET = 1
@@ -170,26 +175,32 @@ def getMasterLeagueList():
 
     Some competitions are only visible when matches are being
     played so any new competitions are added to the master list
-    whenever this script is run.
+    when it is refreshed. The list is read from disk so that the dialog
+    can be shown straight away. If it's out of date then it's updated in
+    the background and the new leagues will be shown next time.
 
     Returns: masterLeagueList - list of competitions in dict
                                 format {"name": xx, "id", xx}
     '''
+    global refresher
 
-    currentleagues = getAllLeagues()
-
-    try:
-        masterLeagueList = json.loads(_S_("masterlist"))
+    store = LeagueStore(LEAGUE_STORE)
 
-    except:
-        masterLeagueList = []
+    # Older versions kept the list in the settings file
+    if not store:
+        try:
+            store.merge(json.loads(_S_("masterlist")))
+        except:
+            pass
 
-    masterLeagueList += [x for x in currentleagues 
-                         if x not in masterLeagueList]
+    if store.stale:
+        refresher = store.refreshInBackground()
 
-    _A_.setSetting(id="masterlist",value=json.dumps(masterLeagueList))
+        # Nothing to show yet so we've got to wait
+        if not store:
+            refresher.join()
 
-    return masterLeagueList
+    return store.leagues
 
 def loadLeagues():
     '''See if there are any previously selected leagues.
@@ -219,6 +230,15 @@ def resetLeagues():
     '''
     _A_.setSetting(id="watchedleagues",value="[]")
     _A_.setSetting(id="masterlist",value="[]")
+
+    try:
+        LeagueStore(LEAGUE_STORE).clear()
+
+    # e.g. the profile folder can't be written to
+    except (IOError, OSError), e:
+        ok = xbmcgui.Dialog().ok(localise(32028), str(e))
+        return
+
     ok = xbmcgui.Dialog().ok(localise(32023), localise(32027))
 
 def toggleNotification():
@@ -227,6 +247,9 @@ def toggleNotification():
     Notify("BBC Football Scores", localise(32024) % (localise(32025) if state else localise(32026)))
     _A_.setSetting(id="Alerts", value=str(state).lower())
 
+# Thread used to update the master list of leagues
+refresher = None
+
 # Let's check how the user has called the script
 
 # If an argument has bee passed to the script, is it one that the script
@@ -246,4 +269,8 @@ elif mode == TOGGLE_NOTIFICATIONS:
 
 # Let's run the script to select leagues to watch
 else:
-    selectLeagues()
\ No newline at end of file
+    selectLeagues()
+
+    # Make sure the master list is saved before we finish
+    if refresher:
+        refresher.join()
\ No newline at end of file